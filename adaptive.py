@@ -0,0 +1,114 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+
+
+def is_overload(status):
+    return status == 429 or (status is not None and status >= 500)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), None if absent."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AimdController:
+    """Adaptive limit on requests in flight: additive increase while the server is
+    healthy, multiplicative decrease on timeouts, 429s and 5xx responses."""
+
+    def __init__(self, initial=4, minimum=1, maximum=64, decrease=0.5, latency_factor=2.0):
+        self.window = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.slow_start = True
+        self.baseline = None
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+        self.peak_window = self.window
+        self.increases = 0
+        self.decreases = 0
+        self.overloads = 0
+
+    async def acquire(self):
+        """Sit out any Retry-After pause, then wait for a free slot.
+
+        The slot is only taken once nothing is left to wait for, so a caller
+        cancelled while waiting holds no slot.
+        """
+        while True:
+            delay = self.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with self.condition:
+                await self.condition.wait_for(lambda: self.in_flight < int(self.window))
+                # A response that came in meanwhile may have set a new pause.
+                if self.paused_until <= time.monotonic():
+                    self.in_flight += 1
+                    return
+
+    async def release(self, started, status=None, timed_out=False, retry_after=None, cancelled=False):
+        """Free the slot; `started` is the monotonic time the request actually went out.
+
+        A cancelled request (the losing copy of a hedged one) says nothing about
+        the server, so it only frees its slot.
+        """
+        latency = time.monotonic() - started
+        async with self.condition:
+            self.in_flight -= 1
+            if cancelled:
+                pass
+            elif timed_out or is_overload(status):
+                self.overloads += 1
+                self._back_off(started, parse_retry_after(retry_after))
+            else:
+                self._grow(latency)
+            self.condition.notify_all()
+
+    def _grow(self, latency):
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # Let the baseline drift up slowly so a one-off fast response does not pin it.
+            self.baseline += 0.01 * (latency - self.baseline)
+        if latency <= self.baseline * self.latency_factor and self.window < self.maximum:
+            # Like TCP: +1 per response until the first overload, then roughly
+            # +1 per window's worth of successful responses.
+            step = 1 if self.slow_start else 1 / self.window
+            self.window = min(self.maximum, self.window + step)
+            self.peak_window = max(self.peak_window, self.window)
+            self.increases += 1
+
+    def _back_off(self, started, retry_after):
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        # Requests sent before the last cut were part of the same overload, so
+        # they must not shrink the window again.
+        if started < self.last_decrease:
+            return
+        self.slow_start = False
+        self.window = max(self.minimum, self.window * self.decrease)
+        self.last_decrease = time.monotonic()
+        self.decreases += 1
+
+    def stats(self):
+        return {
+            'window': round(self.window, 2),
+            'peak_window': round(self.peak_window, 2),
+            'in_flight': self.in_flight,
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'overload_responses': self.overloads,
+        }
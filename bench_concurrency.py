@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import aiohttp
+import requests
+
+import fixture_server
+from quotes_scraper import parse_quotes
+
+STRATEGIES = ['sequential', 'threaded', 'multiprocessing', 'asyncio', 'hybrid']
+WORKER_COUNTS = [1, 4, 16]
+PAGES = 100
+
+
+def fetch_timed(url):
+    start = time.perf_counter()
+    html = requests.get(url).text
+    return html, time.perf_counter() - start
+
+
+def fetch_and_parse(url):
+    html, latency = fetch_timed(url)
+    return parse_quotes(html), latency
+
+
+def run_sequential(urls, workers):
+    return [fetch_and_parse(url)[1] for url in urls]
+
+
+def run_threaded(urls, workers):
+    with ThreadPoolExecutor(workers) as executor:
+        return [latency for _, latency in executor.map(fetch_and_parse, urls)]
+
+
+def run_multiprocessing(urls, workers):
+    with multiprocessing.Pool(workers) as pool:
+        return [latency for _, latency in pool.map(fetch_and_parse, urls)]
+
+
+async def _fetch_async(session, url, sem):
+    async with sem:
+        start = time.perf_counter()
+        async with session.get(url) as response:
+            html = await response.text()
+        return html, time.perf_counter() - start
+
+
+async def _run_asyncio(urls, workers, pool=None):
+    sem = asyncio.Semaphore(workers)
+    loop = asyncio.get_running_loop()
+    connector = aiohttp.TCPConnector(limit=workers)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def one(url):
+            html, latency = await _fetch_async(session, url, sem)
+            if pool is None:
+                parse_quotes(html)
+            else:
+                await loop.run_in_executor(pool, parse_quotes, html)
+            return latency
+        return await asyncio.gather(*(one(url) for url in urls))
+
+
+def run_asyncio(urls, workers):
+    return asyncio.run(_run_asyncio(urls, workers))
+
+
+def run_hybrid(urls, workers):
+    with ProcessPoolExecutor(os.cpu_count()) as pool:
+        return asyncio.run(_run_asyncio(urls, workers, pool))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def trial(strategy, workers, base_url, pages):
+    """Run one strategy and measure it; meant to run in a fresh process so RSS and CPU are its own."""
+    urls = [f'{base_url}page/{i}/' for i in range(1, pages + 1)]
+    runner = globals()[f'run_{strategy}']
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    latencies = runner(urls, workers)
+    wall = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime + after.ru_stime - before.ru_stime
+           + children_after.ru_utime - children_before.ru_utime
+           + children_after.ru_stime - children_before.ru_stime)
+    return {
+        'strategy': strategy,
+        'workers': workers,
+        'pages': pages,
+        'wall_seconds': round(wall, 4),
+        'pages_per_second': round(pages / wall, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'cpu_seconds': round(cpu, 4),
+        'peak_rss_kb': max(after.ru_maxrss, children_after.ru_maxrss),
+    }
+
+
+def run_isolated(strategy, workers, base_url, pages):
+    # A fresh interpreter per trial keeps peak RSS and CPU time from leaking
+    # between strategies, and leaves multiprocessing on the platform's default start method.
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--trial',
+                             json.dumps([strategy, workers, base_url, pages])],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def run(strategies=STRATEGIES, worker_counts=WORKER_COUNTS, pages=PAGES, latency=0.05, jitter=0.02, seed=0):
+    server, base_url = fixture_server.serve_in_process(latency, jitter, seed)
+    results = []
+    try:
+        for strategy in strategies:
+            # Sequential ignores the worker count, so one run is enough.
+            for workers in ([1] if strategy == 'sequential' else worker_counts):
+                result = run_isolated(strategy, workers, base_url, pages)
+                print(f"{strategy:>15} workers={workers:<3} {result['pages_per_second']:>8.1f} pages/s "
+                      f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms")
+                results.append(result)
+    finally:
+        server.terminate()
+    return {
+        'config': {'pages': pages, 'latency': latency, 'jitter': jitter, 'seed': seed},
+        'results': results,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare scraping strategies against a local fixture server.")
+    arg_parser.add_argument('--strategies', default=','.join(STRATEGIES))
+    arg_parser.add_argument('--workers', default=','.join(map(str, WORKER_COUNTS)))
+    arg_parser.add_argument('--pages', type=int, default=PAGES)
+    arg_parser.add_argument('--latency', type=float, default=0.05, help="seconds of server latency per page")
+    arg_parser.add_argument('--jitter', type=float, default=0.02, help="+/- seconds of random latency")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--output', default='bench_results.json')
+    arg_parser.add_argument('--trial', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    if args.trial:
+        print(json.dumps(trial(*json.loads(args.trial))))
+        return
+    report = run(args.strategies.split(','), [int(w) for w in args.workers.split(',')],
+                 args.pages, args.latency, args.jitter, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+from items import Book
+
+RATINGS = ['One', 'Two', 'Three', 'Four', 'Five']
+
+
+def raw_fields(i):
+    """Fresh strings for one product card, as a parser hands them over."""
+    return (f'Book {i}: A Tale & More',
+            f'https://books.toscrape.com/catalogue/book-{i}_{i}/index.html',
+            f'£{10 + i % 50}.{i % 100:02d}',
+            ' '.join(['In', 'stock']),
+            ''.join(RATINGS[i % 5]))
+
+
+def as_dict(i):
+    # What task2ABS.parse_listing built before Book.
+    title, url, price, availability, rating = raw_fields(i)
+    return {'title': title, 'url': url, 'price': price, 'availability': availability, 'rating': rating}
+
+
+def as_book(i):
+    return Book(*raw_fields(i))
+
+
+def measure(build, count):
+    """(bytes per item, seconds) to hold `count` items built by `build`."""
+    # Timed without tracemalloc, which slows allocation down several times.
+    gc.collect()
+    start = time.perf_counter()
+    items = [build(i) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    del items
+    gc.collect()
+    tracemalloc.start()
+    items = [build(i) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return size / count, elapsed
+
+
+def run(count=1_000_000):
+    print(f"{count} listing items (title, url, price, availability, rating)")
+    results = {}
+    for name, build in [('dict', as_dict), ('Book', as_book)]:
+        per_item, elapsed = measure(build, count)
+        results[name] = per_item
+        print(f"{name:>5}: {per_item:7.1f} bytes/item  {per_item * count / 2 ** 20:8.1f} MiB  built in {elapsed:.2f}s")
+    print(f"Book uses {results['Book'] / results['dict']:.0%} of the dict memory")
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare the memory of scraped items as dicts and as Book records.")
+    arg_parser.add_argument('--count', type=int, default=1_000_000)
+    args = arg_parser.parse_args()
+    run(args.count)
+
+
+if __name__ == "__main__":
+    main()
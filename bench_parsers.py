@@ -0,0 +1,92 @@
+import argparse
+import glob
+import os
+import time
+import requests
+from urllib.parse import urljoin
+
+import books_async_scraper
+import parsers
+import task2ABS
+import task3
+from parsers import available_backends, get_backend
+
+PAGES_DIR = 'saved_pages'
+CATALOGUE_URL = 'https://books.toscrape.com/catalogue/'
+
+
+def save_pages(count, pages_dir=PAGES_DIR):
+    """Download `count` listing pages and the first book page of each for offline benchmarking."""
+    os.makedirs(pages_dir, exist_ok=True)
+    for i in range(1, count + 1):
+        url = urljoin(CATALOGUE_URL, f'page-{i}.html')
+        html = requests.get(url).text
+        with open(os.path.join(pages_dir, f'page-{i}.html'), 'w', encoding='utf-8') as f:
+            f.write(html)
+        book_url = task2ABS.parse_listing(html, url)[0]['url']
+        with open(os.path.join(pages_dir, f'book-{i}.html'), 'w', encoding='utf-8') as f:
+            f.write(requests.get(book_url).text)
+
+
+def load_pages(pattern, pages_dir=PAGES_DIR):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, pattern))):
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def extract_all(listings, details, backend):
+    parser = get_backend(backend)
+    results = []
+    for html in listings:
+        results.append(books_async_scraper.parse_page(html, CATALOGUE_URL, backend))
+        results.append(task2ABS.parse_listing(html, CATALOGUE_URL, parser))
+        results.append(task3.parse_page(html, CATALOGUE_URL, parser))
+        results.append(books_async_scraper.get_total_pages(html, backend))
+    for html in details:
+        results.append(task2ABS.parse_book_details(html, parser))
+    return results
+
+
+def run(repeat=5, pages_dir=PAGES_DIR):
+    listings = load_pages('page-*.html', pages_dir)
+    details = load_pages('book-*.html', pages_dir)
+    if not listings and not details:
+        print(f"No saved pages in {pages_dir}/, run with --save first.")
+        return
+    print(f"{len(listings)} listing pages, {len(details)} detail pages, {repeat} rounds")
+    partial = parsers.PARTIAL
+    parsers.PARTIAL = False
+    expected = extract_all(listings, details, 'bs4')
+    try:
+        for backend in available_backends():
+            # Whole-page parsing first, then the region-only parse each extractor asks for.
+            for parsers.PARTIAL in (False, True):
+                name = f"{backend} ({'partial' if parsers.PARTIAL else 'full'})"
+                if extract_all(listings, details, backend) != expected:
+                    print(f"{name}: output differs from bs4, skipping")
+                    continue
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    extract_all(listings, details, backend)
+                elapsed = time.perf_counter() - start
+                pages = (len(listings) + len(details)) * repeat
+                print(f"{name}: {pages / elapsed:.1f} pages/s ({elapsed:.2f}s)")
+    finally:
+        parsers.PARTIAL = partial
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare parser backend throughput on saved pages.")
+    arg_parser.add_argument('--save', type=int, metavar='N', help="download N listing pages first")
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--pages-dir', default=PAGES_DIR)
+    args = arg_parser.parse_args()
+    if args.save:
+        save_pages(args.save, args.pages_dir)
+    run(args.repeat, args.pages_dir)
+
+
+if __name__ == "__main__":
+    main()
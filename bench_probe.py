@@ -0,0 +1,97 @@
+import argparse
+import tempfile
+import threading
+from collections import Counter
+
+import fixture_server
+import http_cache
+from sessions import make_session
+
+# Server behaviours a recrawl can meet, as fixture settings.
+SERVERS = {
+    'conditional GET': {},
+    'no conditional GET': {'conditional': False},
+    'no conditional GET, no HEAD': {'conditional': False, 'allow_head': False},
+    'no conditional GET, HEAD or Range': {'conditional': False, 'allow_head': False, 'ranges': False},
+}
+
+
+class CountingWriter:
+    """Wraps a handler's wfile to count the bytes it sends."""
+
+    def __init__(self, wfile, counter):
+        self.wfile = wfile
+        self.counter = counter
+
+    def write(self, data):
+        self.counter.add(len(data))
+        return self.wfile.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.wfile, name)
+
+
+class Traffic:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.methods = Counter()
+
+    def add(self, size):
+        with self.lock:
+            self.bytes += size
+
+
+def counting_handler(traffic):
+    class CountingHandler(fixture_server.FixtureHandler):
+        def setup(self):
+            super().setup()
+            self.wfile = CountingWriter(self.wfile, traffic)
+
+        def parse_request(self):
+            ok = super().parse_request()
+            with traffic.lock:
+                traffic.methods[self.command] += 1
+            return ok
+    return CountingHandler
+
+
+def recrawl(settings, probe, pages):
+    traffic = Traffic()
+    server, base_url = fixture_server.serve_in_thread(handler=counting_handler(traffic), **settings)
+    urls = [f"{base_url}catalogue/page-{n}.html" for n in range(1, pages + 1)]
+    urls += [f"{base_url}catalogue/book-{n}-0_{n * fixture_server.BOOKS_PER_PAGE}/index.html"
+             for n in range(1, pages + 1)]
+    session = make_session()
+    with tempfile.TemporaryDirectory() as directory:
+        cache = http_cache.HttpCache(directory)
+        for url in urls:
+            http_cache.get(url, session=session, cache=cache, probe='0')
+        traffic.bytes, traffic.methods = 0, Counter()
+        for url in urls:
+            http_cache.get(url, session=session, cache=cache, probe=probe)
+        stats = cache.stats()
+        cache.close()
+    server.shutdown()
+    server.server_close()
+    return traffic.bytes, dict(traffic.methods), stats
+
+
+def run(pages=50):
+    print(f"Recrawl of {2 * pages} cached pages (bytes sent by the server on the second pass)")
+    for name, settings in SERVERS.items():
+        for probe in ('0', 'auto'):
+            sent, methods, stats = recrawl(settings, probe, pages)
+            print(f"{name:>34} probe={probe:<4}: {sent / 1024:8.1f} KiB  requests {methods}  "
+                  f"full GETs avoided {stats['gets_avoided']}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure bytes moved by a recrawl with and without HEAD probing.")
+    arg_parser.add_argument('--pages', type=int, default=50, help="listing pages (plus one book page each)")
+    args = arg_parser.parse_args()
+    run(args.pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import random
+import time
+import numpy as np
+
+from record_store import car_store, student_report, student_scores
+
+BRANDS = ['Toyota', 'Honda', 'Ford', 'Tesla', 'BMW', 'Kia', 'Fiat', 'Audi']
+MODELS = ['Corolla', 'Civic', 'Focus', 'Model 3', 'X5', 'Rio', 'Panda', 'A4']
+
+
+# The dict-based versions below are copied from week1, which runs all of its
+# exercises on import, so they cannot be imported from there.
+
+def drive(car, km):
+    car["mileage"] += km
+
+
+def analyze_mileage(cars):
+    mileage_array = np.array([car["mileage"] for car in cars])
+    return np.sum(mileage_array), np.max(mileage_array), np.min(mileage_array), np.mean(mileage_array)
+
+
+def students(studentdata):
+    def find_highest_scorer():
+        highestscorer = ""
+        highestscore = 0
+        for k, v in studentdata.items():
+            if sum(v) > highestscore:
+                highestscorer = k
+                highestscore = sum(v)
+        return highestscorer
+
+    def average_score():
+        totalscore = sum(sum(v) for v in studentdata.values())
+        return totalscore / len(studentdata)
+
+    def above_average():
+        avg_score = average_score()
+        return [k for k, v in studentdata.items() if sum(v) > avg_score]
+
+    return find_highest_scorer(), average_score(), above_average()
+
+
+def make_data(count, seed=0):
+    rng = random.Random(seed)
+    cars = [{"brand": rng.choice(BRANDS), "model": rng.choice(MODELS),
+             "year": rng.randint(1995, 2024), "mileage": rng.randint(0, 300000)}
+            for _ in range(count)]
+    trips = [(rng.randrange(count), rng.randint(1, 2000)) for _ in range(count)]
+    studentdata = {f"student{i}": [rng.randint(0, 10) for _ in range(4)] for i in range(count)}
+    return cars, trips, studentdata
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(count=1_000_000, seed=0):
+    cars, trips, studentdata = make_data(count, seed)
+    print(f"{count} cars, {count} trips, {count} students")
+
+    store, build = timed(car_store, cars)
+    scores, build_scores = timed(student_scores, studentdata)
+    print(f"building the stores (one-off): {build + build_scores:.3f}s")
+    indices = np.array([index for index, _ in trips])
+    amounts = np.array([km for _, km in trips])
+
+    def drive_all():
+        for index, km in trips:
+            drive(cars[index], km)
+
+    results = []
+    for name, baseline, vectorized in [
+        ('drive', drive_all, lambda: store.add('mileage', indices, amounts)),
+        ('analyze_mileage', lambda: analyze_mileage(cars),
+         lambda: tuple(store.summary('mileage').values())),
+        ('students', lambda: students(studentdata), lambda: student_report(scores)),
+        ('mileage by brand', lambda: _mileage_by_brand(cars),
+         lambda: store.group_by('brand', 'mileage', 'mean')),
+    ]:
+        expected, slow = timed(baseline)
+        got, fast = timed(vectorized)
+        if name == 'drive':
+            expected, got = [car["mileage"] for car in cars], store['mileage'].tolist()
+        elif name == 'mileage by brand':
+            got = dict(zip(got[0].tolist(), got[1].tolist()))
+        if not _same(expected, got):
+            print(f"{name}: results differ")
+        print(f"{name:>18}: dicts {slow * 1000:9.2f} ms   store {fast * 1000:8.2f} ms   {slow / fast:7.1f}x")
+        results.append({'name': name, 'dict_ms': slow * 1000, 'store_ms': fast * 1000})
+    return results
+
+
+def _mileage_by_brand(cars):
+    totals, counts = {}, {}
+    for car in cars:
+        totals[car["brand"]] = totals.get(car["brand"], 0) + car["mileage"]
+        counts[car["brand"]] = counts.get(car["brand"], 0) + 1
+    return {brand: totals[brand] / counts[brand] for brand in totals}
+
+
+def _same(expected, got):
+    if isinstance(expected, dict):
+        return expected.keys() == got.keys() and all(np.isclose(expected[k], got[k]) for k in expected)
+    if isinstance(expected, (tuple, list)) and expected and isinstance(expected[0], (int, float, np.number)):
+        return np.allclose(expected, got)
+    return expected == got
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare week1's dict-based aggregations with RecordStore.")
+    arg_parser.add_argument('--count', type=int, default=1_000_000)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+    run(args.count, args.seed)
+
+
+if __name__ == "__main__":
+    main()
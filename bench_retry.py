@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+import aiohttp
+
+import fixture_server
+import http_cache
+from bench_concurrency import percentile
+from books_async_scraper import fetch
+from rate_limiter import TokenBucket
+from retry import FetchError, RetryPolicy
+
+# Fixture faults: a few slow responses, some 500s and dropped connections, and one page that never works.
+FAULTS = {'slow_rate': 0.03, 'slow_latency': 1.0, 'failure_rate': 0.05, 'drop_rate': 0.02,
+          'broken': ('/catalogue/broken_0/index.html',)}
+POLICIES = {
+    'single attempt': {'attempts': 1, 'hedge': False},
+    'retries': {'hedge': False},
+    'retries + hedging': {},
+}
+
+
+async def crawl(base_url, policy, pages, workers):
+    urls = iter([f'{base_url}catalogue/broken_0/index.html'] +
+                [f'{base_url}catalogue/book-{n}_{n}/index.html' for n in range(1, pages)])
+    latencies, failed = [], []
+    limiter = TokenBucket(10_000, 10_000)
+
+    async def worker(session, cache):
+        for url in urls:
+            start = time.perf_counter()
+            try:
+                await fetch(session, url, limiter, policy=policy, cache=cache)
+            except FetchError:
+                failed.append(url)
+            latencies.append(time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = http_cache.HttpCache(directory)
+        async with aiohttp.ClientSession() as session:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(session, cache) for _ in range(workers)))
+            wall = time.perf_counter() - start
+        cache.close()
+    return latencies, failed, wall
+
+
+def run(pages=500, workers=16, latency=0.02, jitter=0.01, seed=0):
+    print(f"{pages} pages, {workers} workers, {latency * 1000:.0f}ms +/- {jitter * 1000:.0f}ms latency, faults {FAULTS}")
+    results = {}
+    for name, settings in POLICIES.items():
+        server, base_url = fixture_server.serve_in_process(latency, jitter, seed, **FAULTS)
+        try:
+            policy = RetryPolicy(seed=seed, **settings)
+            latencies, failed, wall = asyncio.run(crawl(base_url, policy, pages, workers))
+        finally:
+            server.terminate()
+        results[name] = {
+            'p50_ms': round(statistics.median(latencies) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'failed_urls': len(failed),
+            'wall_seconds': round(wall, 2),
+            **policy.stats(),
+        }
+        r = results[name]
+        print(f"{name:>18}: p50={r['p50_ms']}ms p95={r['p95_ms']}ms p99={r['p99_ms']}ms  "
+              f"failed {r['failed_urls']}  retries {r['retries']}  hedges {r['hedges']} "
+              f"(won {r['hedge_wins']})  {r['wall_seconds']}s")
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure page latency and lost pages against a faulty fixture server.")
+    arg_parser.add_argument('--pages', type=int, default=500)
+    arg_parser.add_argument('--workers', type=int, default=16)
+    arg_parser.add_argument('--latency', type=float, default=0.02)
+    arg_parser.add_argument('--jitter', type=float, default=0.01)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+    run(args.pages, args.workers, args.latency, args.jitter, args.seed)
+
+
+if __name__ == "__main__":
+    main()
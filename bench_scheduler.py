@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from scheduler import WorkerPool
+
+COUNTS = [10_000, 100_000, 1_000_000]
+WORKERS = 64
+CHUNK = 64
+
+
+def urls(count):
+    return (f'https://books.toscrape.com/catalogue/page-{i}.html' for i in range(count))
+
+
+async def handle(url):
+    # A request that answers at once, so what is left is the scheduling.
+    await asyncio.sleep(0)
+
+
+async def eager(count):
+    # The old scrape_books: a coroutine per URL built up front, then gathered a slice at a time.
+    tasks = [handle(url) for url in urls(count)]
+    for i in range(0, len(tasks), CHUNK):
+        await asyncio.gather(*tasks[i:i + CHUNK])
+
+
+async def pooled(count):
+    await WorkerPool(handle, WORKERS, WORKERS).run(urls(count))
+
+
+def measure(schedule, count):
+    """(peak bytes, seconds per URL) to schedule `count` URLs."""
+    # Timed without tracemalloc, which slows allocation down several times.
+    gc.collect()
+    start = time.perf_counter()
+    asyncio.run(schedule(count))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    asyncio.run(schedule(count))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, elapsed / count
+
+
+def run(counts=COUNTS):
+    print(f"Scheduling URLs onto a no-op fetch ({WORKERS} workers, slices of {CHUNK} for eager)")
+    results = []
+    for count in counts:
+        for name, schedule in [('eager', eager), ('pool', pooled)]:
+            peak, per_url = measure(schedule, count)
+            results.append({'scheduler': name, 'urls': count, 'peak_mib': round(peak / 2 ** 20, 2),
+                            'us_per_url': round(per_url * 1e6, 2)})
+            print(f"{count:>9} URLs {name:>5}: peak {peak / 2 ** 20:8.2f} MiB  {per_url * 1e6:6.2f} us/URL")
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare memory and per-URL overhead of the eager and pooled schedulers.")
+    arg_parser.add_argument('--counts', default=','.join(map(str, COUNTS)))
+    args = arg_parser.parse_args()
+    run([int(count) for count in args.counts.split(',')])
+
+
+if __name__ == "__main__":
+    main()
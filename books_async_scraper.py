@@ -1,85 +1,377 @@
+import argparse
 import asyncio
 import aiohttp
 import async_timeout
+import http_cache
+import metrics
+import multiprocessing
+import os
+import socket
 import time
-import json
-from bs4 import BeautifulSoup
+from adaptive import AimdController, is_overload, parse_retry_after
+from page_memo import default_memo, extractor_key, fingerprint
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from export import Field, parse_price
+from frontier import ShardQueue
+from items import BookLink
 from urllib.parse import urljoin
+from parsers import get_backend, LISTING, PAGER, PRODUCT_POD, TITLE_LINK, PRICE, PAGER_CURRENT
+from rate_limiter import SharedTokenBucket, TokenBucket
+from retry import FetchError, RetryPolicy
+from scheduler import ReorderBuffer, WorkerPool
+from streaming_stats import RecordSummary
+from writers import open_writer
 
 BASE_URL = 'https://books.toscrape.com/'
 CATALOGUE_URL = urljoin(BASE_URL, 'catalogue/')
 RATE_LIMIT = 5  # max requests per second
+BURST = 5  # requests allowed back to back before the rate kicks in
+PARSE_WORKERS = os.cpu_count() or 1
+QUEUE_SIZE = 20  # pages buffered between stages
+PARSER = None  # parser backend name, None means parsers.DEFAULT_BACKEND
+MAX_IN_FLIGHT = 64  # ceiling for the adaptive concurrency window
+TIMEOUT = 10  # seconds per request, each retry and hedge getting its own
+# Pages allowed ahead of the next one due in books.json: enough for every
+# fetch slot and both queues, so only a straggler ever holds the others up.
+REORDER_WINDOW = MAX_IN_FLIGHT + 2 * QUEUE_SIZE
+SHARD_SIZE = 5  # listing pages a worker leases at a time in sharded mode
+QUEUE_FILE = 'books_queue.sqlite'
 
 
-def parse_book_info(book, base_url):
-    title = book.h3.a['title']
-    price = book.find('p', class_='price_color').text.strip()
-    rel_url = book.h3.a['href']
+def parse_book_info(book, base_url, parser=None):
+    parser = parser or get_backend(PARSER)
+    link = parser.select_one(book, TITLE_LINK)
+    title = parser.attr(link, 'title')
+    price = parser.text(parser.select_one(book, PRICE)).strip()
+    rel_url = parser.attr(link, 'href')
     product_url = urljoin(base_url, rel_url)
-    return {
-        'title': title,
-        'price': price,
-        'product_page_url': product_url
-    }
+    return BookLink(title, product_url, price)
 
 
-async def fetch(session, url, sem):
-    async with sem:
-        async with async_timeout.timeout(10):
-            async with session.get(url) as response:
-                return await response.text()
+def parse_page(html, base_url, backend=None):
+    parser = get_backend(backend or PARSER)
+    doc = parser.parse(html, LISTING)
+    return [parse_book_info(book, base_url, parser) for book in parser.select(doc, PRODUCT_POD)]
 
 
-def get_total_pages(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    pager = soup.find('li', class_='current')
-    if pager:
-        text = pager.text.strip()
+def timed_parse_page(html, base_url, backend=None):
+    # Runs in a pool worker, so the timing travels back with the result
+    # instead of landing in the worker's own metrics registry.
+    start = time.perf_counter()
+    books = parse_page(html, base_url, backend)
+    return books, time.perf_counter() - start
+
+
+async def request_once(session, url, limiter, controller, policy, cache=None, sent=None):
+    if controller:
+        await controller.acquire()
+    status, timed_out, retry_after, cancelled = None, True, None, False
+    started = time.monotonic()
+    try:
+        async with limiter:
+            started = time.monotonic()
+            if sent is not None:
+                sent.set()
+            async with async_timeout.timeout(TIMEOUT):
+                response = await http_cache.get_async(session, url, cache)
+        status, timed_out = response.status_code, False
+        retry_after = response.headers.get('Retry-After')
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        if controller:
+            await controller.release(started, status, timed_out, retry_after, cancelled)
+    if not is_overload(status):
+        policy.observe(time.monotonic() - started)
+    return response
+
+
+async def fetch(session, url, limiter, controller=None, policy=None, cache=None):
+    """The page's text. Timeouts, dropped connections, 429s and 5xx are retried
+    under `policy`; raises FetchError for this URL alone once its attempts are spent."""
+    policy = policy or RetryPolicy()
+    retry_after = None
+    for attempt in range(policy.attempts):
+        if attempt:
+            policy.retries += 1
+            await asyncio.sleep(policy.backoff(attempt - 1, parse_retry_after(retry_after)))
+        try:
+            response = await policy.hedged(
+                lambda sent: request_once(session, url, limiter, controller, policy, cache, sent))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            reason, retry_after = type(e).__name__, None
+            continue
+        if not is_overload(response.status_code):
+            return response.text
+        reason, retry_after = f'HTTP {response.status_code}', response.headers.get('Retry-After')
+    policy.failures += 1
+    raise FetchError(url, policy.attempts, reason)
+
+
+def get_total_pages(html, backend=None):
+    parser = get_backend(backend or PARSER)
+    pager = parser.select_one(parser.parse(html, PAGER), PAGER_CURRENT)
+    if pager is not None:
+        text = parser.text(pager).strip()
         total = int(text.split()[-1])
         return total
     return 1
 
 
-async def scrape_books():
+def page_urls(total_pages, catalogue_url=CATALOGUE_URL):
+    """Listing URLs after the first, made one at a time as the fetch pool asks for them."""
+    return (urljoin(catalogue_url, f'page-{i}.html') for i in range(2, total_pages + 1))
+
+
+async def fetch_stage(session, limiter, controller, policy, html_queue, failures, reorder, page):
+    index, url = page
+    await reorder.wait_turn(index)
+    try:
+        html = await fetch(session, url, limiter, controller, policy)
+    except FetchError as e:
+        # One bad page is reported at the end instead of ending the crawl;
+        # it still goes down the pipeline, empty, so the pages after it are released.
+        failures.append(e)
+        html = None
+    await html_queue.put((index, url, html))
+
+
+async def parse_stage(pool, memo, html_queue, book_queue):
+    loop = asyncio.get_running_loop()
+    extractor = extractor_key(parse_page, CATALOGUE_URL, PARSER)
+    while True:
+        item = await html_queue.get()
+        if item is None:
+            return
+        index, url, html = item
+        if html is None:
+            await book_queue.put((index, []))
+            continue
+        # Pages whose bytes have not changed since the last run reuse their
+        # stored books and never reach the parser pool.
+        digest = fingerprint(html)
+        found, books = memo.lookup(extractor, url, digest)
+        if not found:
+            books, seconds = await loop.run_in_executor(pool, timed_parse_page, html, CATALOGUE_URL, PARSER)
+            metrics.observe('parse_seconds', seconds)
+            memo.store(extractor, url, digest, books)
+        await book_queue.put((index, books))
+
+
+async def write_stage(writer, book_queue, reorder, summary=None):
+    """Write pages in page order, holding those parsed early in `reorder` until their turn."""
+    def write(books):
+        with metrics.timer('serialize_seconds'):
+            for book in books:
+                writer.write(book)
+        if summary is not None:
+            for book in books:
+                summary.add(book)
+
+    while True:
+        item = await book_queue.get()
+        if item is None:
+            break
+        for books in await reorder.put(*item):
+            write(books)
+    for books in reorder.rest():
+        write(books)
+
+
+async def scrape_books(output='books.json'):
     start = time.time()
-    sem = asyncio.Semaphore(RATE_LIMIT)
-    async with aiohttp.ClientSession() as session:
+    limiter = TokenBucket(RATE_LIMIT, BURST)
+    controller = AimdController(maximum=MAX_IN_FLIGHT)
+    policy = RetryPolicy()
+    failures = []
+    memo = default_memo()
+    html_queue = asyncio.Queue(QUEUE_SIZE)
+    book_queue = asyncio.Queue(QUEUE_SIZE)
+    reorder = ReorderBuffer(REORDER_WINDOW)
+    summary = RecordSummary([Field('price', 'float', convert=parse_price)])
+    async with aiohttp.ClientSession(trace_configs=[metrics.trace_config()]) as session:
         # Get first page to determine total pages
         first_page_url = urljoin(CATALOGUE_URL, 'page-1.html')
-        html = await fetch(session, first_page_url, sem)
-        total_pages = get_total_pages(html)
+        html = await fetch(session, first_page_url, limiter, controller, policy)
+        total_pages = memo.extract(get_total_pages, first_page_url, html)
         print(f"Total pages: {total_pages}")
 
-        tasks = []
-        for i in range(1, total_pages + 1):
-            page_url = urljoin(CATALOGUE_URL, f'page-{i}.html')
-            tasks.append(fetch(session, page_url, sem))
-
-        # Rate limiting: ensure no more than 5 requests/sec
-        pages = []
-        for i in range(0, len(tasks), RATE_LIMIT):
-            chunk = tasks[i:i+RATE_LIMIT]
-            results = await asyncio.gather(*chunk)
-            pages.extend(results)
-            if i + RATE_LIMIT < len(tasks):
-                await asyncio.sleep(1)
-
-        books = []
-        for html in pages:
-            soup = BeautifulSoup(html, 'html.parser')
-            for book in soup.select('article.product_pod'):
-                books.append(parse_book_info(book, CATALOGUE_URL))
-
-        with open('books.json', 'w', encoding='utf-8') as f:
-            json.dump(books, f, ensure_ascii=False, indent=2)
+        # Fetching, parsing and writing run side by side; the bounded queues
+        # keep only a handful of URLs and pages in memory whatever the page count.
+        # The controller decides how many of the fetch workers actually have a request out.
+        fetch_page = partial(fetch_stage, session, limiter, controller, policy, html_queue, failures, reorder)
+        fetching = WorkerPool(fetch_page, MAX_IN_FLIGHT, QUEUE_SIZE, drain_on_interrupt=True)
+        with ProcessPoolExecutor(PARSE_WORKERS) as pool, open_writer(output) as writer:
+            writing = asyncio.create_task(write_stage(writer, book_queue, reorder, summary))
+            parsers = [asyncio.create_task(parse_stage(pool, memo, html_queue, book_queue))
+                       for _ in range(PARSE_WORKERS)]
+            await html_queue.put((0, first_page_url, html))
+            await fetching.run(enumerate(page_urls(total_pages, CATALOGUE_URL), 1))
+            for _ in parsers:
+                await html_queue.put(None)
+            await asyncio.gather(*parsers)
+            await book_queue.put(None)
+            await writing
 
         end = time.time()
-        print(f"Scraped {len(books)} books in {end - start:.2f} seconds.")
+        print(f"Scraped {writer.count} books in {end - start:.2f} seconds.")
+        if fetching.draining:
+            print(f"Stopped early: {total_pages - 1 - fetching.handled} listing pages not fetched.")
+        print(f"Rate limiter: {limiter.stats()}")
+        print(f"Concurrency: {controller.stats()}")
+        print(f"Reorder buffer: at most {reorder.peak_held} pages held")
+        print(f"Retries: {policy.stats()}")
+        for error in failures:
+            print(f"Skipped {error}")
+        print(f"HTTP cache: {http_cache.default_cache().stats()}")
+        print(f"Parse memo: {memo.stats()}")
+        print(f"Price distribution: {summary.to_dict()['price']}")
+        metrics.REGISTRY.write()
+        print("Timings written to metrics.prom and metrics.json")
+
+
+async def crawl_shard(session, limiter, controller, policy, memo, urls):
+    """Fetch and parse one shard's pages; returns (their books in page order, the URLs that failed)."""
+    pages = await asyncio.gather(*(fetch(session, url, limiter, controller, policy) for url in urls),
+                                 return_exceptions=True)
+    books, failed = [], []
+    for url, html in zip(urls, pages):
+        if isinstance(html, FetchError):
+            failed.append(url)
+        elif isinstance(html, BaseException):
+            raise html
+        else:
+            books.extend(memo.extract(parse_page, url, html, url, PARSER))
+    return books, failed
+
+
+async def keep_leased(queue, shard_id, owner):
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        if not await asyncio.to_thread(queue.renew, shard_id, owner):
+            return
+
+
+async def work(queue_path, owner, rate=RATE_LIMIT, burst=BURST, idle_wait=0.25):
+    """Lease shards from the queue and crawl them until none is left; returns this worker's counts."""
+    queue = ShardQueue(queue_path)
+    limiter = SharedTokenBucket(queue_path, rate, burst)
+    controller = AimdController(maximum=MAX_IN_FLIGHT)
+    policy = RetryPolicy()
+    memo = default_memo()
+    shards = books = 0
+    async with aiohttp.ClientSession(trace_configs=[metrics.trace_config()]) as session:
+        while True:
+            # Queue calls can wait up to a minute on another process's lock; keep them off the event loop.
+            leased = await asyncio.to_thread(queue.lease, owner)
+            if leased is None:
+                if await asyncio.to_thread(queue.finished):
+                    break
+                # Everything left is leased to other workers; wait in case one of them dies.
+                await asyncio.sleep(idle_wait)
+                continue
+            shard_id, urls = leased
+            renewing = asyncio.create_task(keep_leased(queue, shard_id, owner))
+            try:
+                found, failed = await crawl_shard(session, limiter, controller, policy, memo, urls)
+            finally:
+                renewing.cancel()
+            if len(failed) == len(urls):
+                # Nothing to keep: the shard goes back to the queue, and
+                # ShardQueue gives up on it after MAX_ATTEMPTS leases.
+                await asyncio.to_thread(queue.release, shard_id, owner, f"no page could be fetched: {failed}")
+                continue
+            # The pages that did come are kept; the ones that did not are noted with them.
+            error = f"pages not fetched: {failed}" if failed else None
+            if await asyncio.to_thread(queue.complete, shard_id, owner, found, error=error):
+                shards += 1
+                books += len(found)
+    queue.close()
+    limiter.close()
+    return {'shards': shards, 'books': books, 'rate_limiter': limiter.stats(), 'retries': policy.stats()}
+
+
+def run_worker(queue_path=QUEUE_FILE, rate=RATE_LIMIT, burst=BURST):
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    print(f"Worker {owner}: {asyncio.run(work(queue_path, owner, rate, burst))}")
+
+
+async def seed_queue(queue, queue_path, catalogue_url, shard_size, rate, burst):
+    limiter = SharedTokenBucket(queue_path, rate, burst)
+    async with aiohttp.ClientSession() as session:
+        html = await fetch(session, urljoin(catalogue_url, 'page-1.html'), limiter)
+    limiter.close()
+    total_pages = get_total_pages(html)
+    print(f"Total pages: {total_pages}")
+    return queue.add([urljoin(catalogue_url, f'page-{i}.html') for i in range(1, total_pages + 1)], shard_size)
+
+
+def scrape_books_sharded(workers=PARSE_WORKERS, output='books.json', queue_path=QUEUE_FILE,
+                         shard_size=SHARD_SIZE, catalogue_url=CATALOGUE_URL, rate=RATE_LIMIT, burst=BURST):
+    """Crawl with `workers` processes that lease shards of listing pages from a shared queue.
+
+    All workers draw from one rate limit kept in the queue file. More can join
+    while it runs with --worker, from other shells or hosts sharing the file.
+    Running it again resumes an unfinished queue. Returns False, without
+    writing `output`, when workers died and left shards unfinished.
+    """
+    start = time.time()
+    queue = ShardQueue(queue_path)
+    if not queue.counts():
+        shards = asyncio.run(seed_queue(queue, queue_path, catalogue_url, shard_size, rate, burst))
+        print(f"Queued {shards} shards of {shard_size} pages")
+    elif queue.finished():
+        print(f"Crawl already complete, delete {queue_path} to start over.")
+    processes = [multiprocessing.Process(target=run_worker, args=(queue_path, rate, burst))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    for n, process in enumerate(processes):
+        if process.exitcode != 0:
+            print(f"Worker {n} (pid {process.pid}) exited with code {process.exitcode}")
+    if not queue.finished():
+        # Leased shards of dead workers go back to the queue once their lease runs out.
+        print(f"Crawl incomplete, shards: {queue.counts()}. Run again to resume; {output} was not written.")
+        queue.close()
+        return False
+
+    summary = RecordSummary([Field('price', 'float', convert=parse_price)])
+    with open_writer(output) as writer:
+        for _, books in queue.results():
+            for book in books:
+                writer.write(book)
+                summary.add(book)
+    print(f"Scraped {writer.count} books with {workers} workers in {time.time() - start:.2f} seconds.")
+    print(f"Shards: {queue.counts()}")
+    for shard_id, urls, error in queue.failures():
+        print(f"Shard {shard_id} failed ({error}): {urls}")
+    for shard_id, error in queue.partial():
+        print(f"Shard {shard_id} is incomplete, {error}")
+    print(f"Price distribution: {summary.to_dict()['price']}")
+    queue.close()
+    return True
 
 
 def main():
-    asyncio.run(scrape_books())
+    arg_parser = argparse.ArgumentParser(description="Scrape the books.toscrape.com catalogue.")
+    arg_parser.add_argument('--workers', type=int, help="crawl with this many processes sharing a shard queue")
+    arg_parser.add_argument('--worker', action='store_true', help="join a running sharded crawl as one more worker")
+    arg_parser.add_argument('--queue', default=QUEUE_FILE)
+    arg_parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    arg_parser.add_argument('--output', default='books.json')
+    args = arg_parser.parse_args()
+    if args.worker:
+        run_worker(args.queue)
+    elif args.workers:
+        if not scrape_books_sharded(args.workers, args.output, args.queue, args.shard_size):
+            raise SystemExit(1)
+    else:
+        asyncio.run(scrape_books(args.output))
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import ssl
+import time
+from datetime import timezone
+from urllib.parse import urlsplit
+
+try:
+    from cryptography import x509
+except ImportError:
+    x509 = None
+
+TIMEOUT = 5  # seconds allowed for connect + TLS handshake per host
+CONCURRENCY = 500  # handshakes in flight at once
+EXPIRY_DAYS = 30  # certificates expiring sooner than this are flagged
+CACHE_TTL = 6 * 3600  # seconds an audited certificate is trusted before it is checked again
+CACHE_PATH = os.environ.get('CERT_CACHE', '.cert_cache.sqlite')
+
+
+def parse_target(target, default_port=443):
+    """(host, port) from 'host', 'host:port' or an https:// URL."""
+    target = target.strip()
+    parts = urlsplit(target if '//' in target else f'//{target}')
+    return parts.hostname, parts.port or default_port
+
+
+def _names(rdns):
+    # getpeercert() gives ((('commonName', 'x'),), (('organizationName', 'y'),), ...)
+    return {key: value for rdn in rdns for key, value in rdn}
+
+
+def describe(cert):
+    """Subject, issuer, validity and SAN of a getpeercert() dict, with times as epoch seconds."""
+    return {
+        'subject': _names(cert.get('subject', ())),
+        'issuer': _names(cert.get('issuer', ())),
+        'not_before': ssl.cert_time_to_seconds(cert['notBefore']),
+        'not_after': ssl.cert_time_to_seconds(cert['notAfter']),
+        'san': [value for kind, value in cert.get('subjectAltName', ()) if kind in ('DNS', 'IP Address')],
+        'serial': cert.get('serialNumber'),
+    }
+
+
+def decode_der(der):
+    """describe()-style dict of a DER certificate, None when it cannot be decoded.
+
+    Once verification fails the handshake gives only the raw certificate,
+    which the standard library has no public decoder for, so this needs the
+    cryptography package.
+    """
+    if x509 is None:
+        return None
+    try:
+        cert = x509.load_der_x509_certificate(der)
+    except ValueError:
+        return None
+    try:
+        alt_names = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        san = alt_names.get_values_for_type(x509.DNSName)
+        san += [str(ip) for ip in alt_names.get_values_for_type(x509.IPAddress)]
+    except x509.ExtensionNotFound:
+        san = []
+    return {
+        'subject': _x509_names(cert.subject),
+        'issuer': _x509_names(cert.issuer),
+        'not_before': _x509_time(cert, 'not_valid_before'),
+        'not_after': _x509_time(cert, 'not_valid_after'),
+        'san': san,
+        'serial': format(cert.serial_number, 'X'),
+    }
+
+
+# The getpeercert() keys for the attributes describe() and the report read.
+_NAME_KEYS = {'CN': 'commonName', 'O': 'organizationName', 'OU': 'organizationalUnitName', 'C': 'countryName',
+              'ST': 'stateOrProvinceName', 'L': 'localityName'}
+
+
+def _x509_names(name):
+    return {_NAME_KEYS.get(attr.rfc4514_attribute_name, attr.rfc4514_attribute_name): attr.value for attr in name}
+
+
+def _x509_time(cert, field):
+    # cryptography 42 added timezone-aware *_utc properties and deprecated the naive UTC ones.
+    value = getattr(cert, f'{field}_utc', None) or getattr(cert, field).replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def verifying_context(cafile=None):
+    """The context every handshake of an audit shares, so CAs are loaded once."""
+    return ssl.create_default_context(cafile=cafile)
+
+
+def _unverified_context():
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def _handshake(host, port, context, timeout):
+    """The TLS object of a completed handshake; the connection is dropped straight after."""
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port, ssl=context, server_hostname=host, ssl_handshake_timeout=timeout),
+        timeout)
+    tls = writer.get_extra_info('ssl_object')
+    # No HTTP request follows, so skip the close_notify exchange.
+    writer.transport.abort()
+    return tls
+
+
+async def audit_host(host, port=443, context=None, timeout=TIMEOUT):
+    """Audit one host's certificate; never raises for a network or TLS failure.
+
+    A certificate that fails verification is fetched again without
+    verification so its details are still reported.
+    """
+    context = context or verifying_context()
+    result = {'host': host, 'port': port, 'checked': time.time(), 'verified': False, 'error': None}
+    start = time.perf_counter()
+    try:
+        tls = await _handshake(host, port, context, timeout)
+        result['verified'] = True
+        result.update(describe(tls.getpeercert()))
+    except ssl.SSLCertVerificationError as e:
+        result['error'] = e.verify_message or str(e)
+        try:
+            tls = await _handshake(host, port, _unverified_context(), timeout)
+            details = decode_der(tls.getpeercert(binary_form=True))
+            if details is None:
+                result['unparsed'] = True
+            else:
+                result.update(details)
+        except (OSError, asyncio.TimeoutError, ValueError):
+            pass
+    except asyncio.TimeoutError:
+        result['error'] = f'timed out after {timeout}s'
+    except (OSError, ValueError) as e:
+        result['error'] = str(e) or type(e).__name__
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def flag(result, expiry_days=EXPIRY_DAYS, now=None):
+    """Add days_left / expired / expiring to an audit result, as of `now` (cached results included)."""
+    if 'not_after' in result:
+        days_left = (result['not_after'] - (now or time.time())) / 86400
+        result['days_left'] = round(days_left, 1)
+        result['expired'] = days_left < 0
+        result['expiring'] = 0 <= days_left < expiry_days
+    return result
+
+
+class CertCache:
+    """Audit results by (host, port), kept in SQLite so later runs skip fresh handshakes.
+
+    Only completed handshakes are stored; hosts that timed out or refused the
+    connection are retried on the next audit.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self.db = sqlite3.connect(path)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS certs (
+            host TEXT, port INTEGER, checked REAL, result TEXT, PRIMARY KEY (host, port))""")
+        self.db.commit()
+
+    def get_many(self, targets, now=None):
+        cutoff = (now or time.time()) - self.ttl
+        found = {}
+        for host, port in targets:
+            row = self.db.execute("SELECT result FROM certs WHERE host = ? AND port = ? AND checked >= ?",
+                                  (host, port, cutoff)).fetchone()
+            if row:
+                found[(host, port)] = json.loads(row[0])
+        return found
+
+    def put_many(self, results):
+        self.db.executemany("INSERT OR REPLACE INTO certs VALUES (?, ?, ?, ?)",
+                            [(r['host'], r['port'], r['checked'], json.dumps(r))
+                             for r in results if 'not_after' in r])
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+async def audit(targets, concurrency=CONCURRENCY, timeout=TIMEOUT, cafile=None, cache=None,
+                expiry_days=EXPIRY_DAYS):
+    """Audit many hosts at once; returns one result per distinct (host, port), in input order.
+
+    Results come from `cache` while they are younger than its TTL.
+    """
+    targets = list(dict.fromkeys(parse_target(t) if isinstance(t, str) else tuple(t) for t in targets))
+    cached = cache.get_many(targets) if cache else {}
+    for result in cached.values():
+        result['cached'] = True
+    context = verifying_context(cafile)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(host, port):
+        async with semaphore:
+            return await audit_host(host, port, context, timeout)
+
+    fresh = await asyncio.gather(*(bounded(host, port) for host, port in targets if (host, port) not in cached))
+    if cache:
+        cache.put_many(fresh)
+    by_target = {**cached, **{(r['host'], r['port']): r for r in fresh}}
+    return [flag(by_target[target], expiry_days) for target in targets]
+
+
+def audit_all(targets, **kwargs):
+    return asyncio.run(audit(targets, **kwargs))
+
+
+def read_targets(path):
+    with open(path, encoding='utf-8') as f:
+        return [line for line in (line.strip() for line in f) if line and not line.startswith('#')]
+
+
+def status(result):
+    if 'not_after' not in result:
+        # An untrusted certificate whose details could not be decoded.
+        return 'UNTRUSTED' if result.get('unparsed') else 'UNREACHABLE'
+    if result['expired']:
+        return 'EXPIRED'
+    if not result['verified']:
+        return 'UNTRUSTED'
+    if result['expiring']:
+        return 'EXPIRING'
+    return 'OK'
+
+
+def print_report(results):
+    for r in results:
+        days = f"{r['days_left']:>7.1f}d" if 'days_left' in r else ' ' * 8
+        issuer = r.get('issuer', {}).get('commonName') or r.get('issuer', {}).get('organizationName') or ''
+        detail = r['error'] or f"issuer={issuer}"
+        print(f"{status(r):<11} {days} {r['host']}:{r['port']}  {detail}")
+    counts = {}
+    for r in results:
+        counts[status(r)] = counts.get(status(r), 0) + 1
+    print(', '.join(f"{name}: {count}" for name, count in sorted(counts.items())))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Audit the TLS certificates of many hosts concurrently.")
+    arg_parser.add_argument('hosts', nargs='*', help="host, host:port or https:// URL")
+    arg_parser.add_argument('--file', help="file with one host per line")
+    arg_parser.add_argument('--timeout', type=float, default=TIMEOUT)
+    arg_parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    arg_parser.add_argument('--days', type=int, default=EXPIRY_DAYS, help="flag certificates expiring within DAYS")
+    arg_parser.add_argument('--ttl', type=float, default=CACHE_TTL, help="seconds to reuse a cached result, 0 to recheck")
+    arg_parser.add_argument('--cafile', help="trust this CA bundle instead of the system one")
+    arg_parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    args = arg_parser.parse_args()
+    targets = args.hosts + (read_targets(args.file) if args.file else [])
+    cache = CertCache(ttl=args.ttl)
+    start = time.perf_counter()
+    results = audit_all(targets, concurrency=args.concurrency, timeout=args.timeout, cafile=args.cafile,
+                        cache=cache, expiry_days=args.days)
+    cache.close()
+    print_report(results)
+    print(f"{len(results)} hosts in {time.perf_counter() - start:.2f}s "
+          f"({sum(1 for r in results if r.get('cached'))} from cache)")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import csv
+import re
+import zipfile
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+CHUNK_ROWS = 65536  # rows buffered per column chunk / row group
+RATINGS = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+MISSING_INT = -1  # NumPy integer columns have no null, so missing counts are stored as -1
+
+
+def parse_price(text):
+    """'£51.77' -> 51.77 (also copes with the 'Â£' mojibake requests produces)."""
+    match = re.search(r'\d+(?:\.\d+)?', text or '')
+    return float(match.group()) if match else None
+
+
+def parse_rating(text):
+    return RATINGS.get(text)
+
+
+def parse_count(text):
+    """'In stock (22 available)' -> 22, 'Out of stock' -> 0, no count given -> None."""
+    if not text:
+        return None
+    match = re.search(r'\((\d+) available\)', text)
+    if match:
+        return int(match.group(1))
+    if 'out of stock' in text.lower():
+        return 0
+    return None
+
+
+def parse_in_stock(text):
+    """'In stock' or 'In stock (22 available)' -> 1, 'Out of stock' -> 0, missing or unknown -> None."""
+    text = (text or '').lower()
+    if 'out of stock' in text:
+        return 0
+    if 'in stock' in text:
+        return 1
+    return None
+
+
+def parse_int(text):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+
+class Field:
+    """One output column: its name, type ('str', 'float' or 'int'), source key and converter."""
+
+    def __init__(self, name, kind='str', source=None, convert=None):
+        self.name = name
+        self.kind = kind
+        self.source = source or name
+        self.convert = convert
+
+    def value(self, record):
+        value = record.get(self.source)
+        if self.convert is not None:
+            return self.convert(value)
+        return value
+
+
+LISTING_SCHEMA = [
+    Field('title'),
+    Field('url'),
+    Field('price', 'float', convert=parse_price),
+    # Listing cards only say whether a book is in stock; the count is on the detail page ('stock').
+    Field('in_stock', 'int', 'availability', parse_in_stock),
+    Field('rating', 'int', convert=parse_rating),
+]
+
+DETAIL_SCHEMA = LISTING_SCHEMA + [
+    Field('upc', source='UPC'),
+    Field('product_type', source='Product Type'),
+    Field('price_excl_tax', 'float', 'Price (excl. tax)', parse_price),
+    Field('price_incl_tax', 'float', 'Price (incl. tax)', parse_price),
+    Field('tax', 'float', 'Tax', parse_price),
+    Field('stock', 'int', 'Availability', parse_count),
+    Field('reviews', 'int', 'Number of reviews', parse_int),
+    Field('description'),
+]
+
+
+class CsvExporter:
+    """Streams typed rows to CSV in schema column order."""
+
+    def __init__(self, filename, schema):
+        self.schema = schema
+        self.file = open(filename, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([field.name for field in schema])
+        self.count = 0
+
+    def write(self, record):
+        row = [field.value(record) for field in self.schema]
+        self.writer.writerow(['' if value is None else value for value in row])
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class _ColumnBuffer:
+    """Collects up to CHUNK_ROWS typed values per column before handing them off as arrays."""
+
+    def __init__(self, schema, chunk_rows):
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self.columns = [[] for _ in schema]
+        self.rows = 0
+        self.count = 0
+
+    def write(self, record):
+        for field, column in zip(self.schema, self.columns):
+            column.append(field.value(record))
+        self.rows += 1
+        self.count += 1
+        if self.rows >= self.chunk_rows:
+            self.flush()
+
+    def arrays(self):
+        arrays = {}
+        for field, column in zip(self.schema, self.columns):
+            if field.kind == 'float':
+                arrays[field.name] = np.array([np.nan if v is None else v for v in column], dtype=np.float64)
+            elif field.kind == 'int':
+                arrays[field.name] = np.array([MISSING_INT if v is None else v for v in column], dtype=np.int64)
+            else:
+                arrays[field.name] = np.array(['' if v is None else v for v in column], dtype=str)
+        return arrays
+
+    def flush(self):
+        if self.rows:
+            self.write_chunk(self.arrays())
+        self.columns = [[] for _ in self.schema]
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class NpzExporter(_ColumnBuffer):
+    """Compressed NumPy archive holding one array per column per chunk ('price/0', 'price/1', ...)."""
+
+    def __init__(self, filename, schema, chunk_rows=CHUNK_ROWS):
+        super().__init__(schema, chunk_rows)
+        self.zip = zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED)
+        self.chunks = 0
+
+    def write_chunk(self, arrays):
+        for name, array in arrays.items():
+            with self.zip.open(f'{name}/{self.chunks}.npy', 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, array, allow_pickle=False)
+        self.chunks += 1
+
+    def close(self):
+        super().close()
+        if self.chunks == 0:
+            # Keep the column list even for an empty export.
+            self.write_chunk(self.arrays())
+        self.zip.close()
+
+
+class ParquetExporter(_ColumnBuffer):
+    """Parquet file written one row group per chunk (needs pyarrow)."""
+
+    def __init__(self, filename, schema, chunk_rows=CHUNK_ROWS):
+        if pyarrow is None:
+            raise ImportError("pyarrow is required for Parquet export")
+        super().__init__(schema, chunk_rows)
+        types = {'str': pyarrow.string(), 'float': pyarrow.float64(), 'int': pyarrow.int64()}
+        self.arrow_schema = pyarrow.schema([(field.name, types[field.kind]) for field in schema])
+        self.writer = pyarrow.parquet.ParquetWriter(filename, self.arrow_schema, compression='zstd')
+
+    def arrays(self):
+        return {field.name: column for field, column in zip(self.schema, self.columns)}
+
+    def write_chunk(self, arrays):
+        self.writer.write_table(pyarrow.table(arrays, schema=self.arrow_schema))
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+def open_exporter(filename, schema):
+    if filename.endswith('.parquet'):
+        return ParquetExporter(filename, schema)
+    if filename.endswith('.npz'):
+        return NpzExporter(filename, schema)
+    return CsvExporter(filename, schema)
+
+
+def export(records, filename, schema):
+    """Stream any iterable of record dicts to `filename`; returns the number of rows written."""
+    with open_exporter(filename, schema) as exporter:
+        for record in records:
+            exporter.write(record)
+    return exporter.count
+
+
+def load_columns(filename):
+    """Read a .npz or .parquet export back as {column: numpy array}."""
+    if filename.endswith('.parquet'):
+        table = pyarrow.parquet.read_table(filename)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    chunks = {}
+    with zipfile.ZipFile(filename) as archive:
+        for name in archive.namelist():
+            column, index = name[:-len('.npy')].rsplit('/', 1)
+            with archive.open(name) as f:
+                chunks.setdefault(column, []).append((int(index), np.lib.format.read_array(f)))
+    return {column: np.concatenate([array for _, array in sorted(parts, key=lambda part: part[0])])
+            for column, parts in chunks.items()}
@@ -0,0 +1,329 @@
+import argparse
+import hashlib
+import multiprocessing
+import random
+import os
+import re
+import ssl
+import subprocess
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from html import escape
+
+QUOTE_PAGES = 10
+QUOTES_PER_PAGE = 10
+BOOK_PAGES = 50
+BOOKS_PER_PAGE = 20
+RATINGS = ['One', 'Two', 'Three', 'Four', 'Five']
+LAST_MODIFIED = formatdate(0, usegmt=True)
+
+
+def quotes_page(n, pages=QUOTE_PAGES):
+    """A page shaped like quotes.toscrape.com/page/N/."""
+    quotes = []
+    for i in range(QUOTES_PER_PAGE):
+        tags = ''.join(f'<a class="tag" href="/tag/t{j}/page/1/">t{j}</a>\n' for j in range(i % 4 + 1))
+        quotes.append(f'''<div class="quote" itemscope itemtype="http://schema.org/CreativeWork">
+        <span class="text" itemprop="text">“Quote {n}-{i} about life &amp; books.”</span>
+        <span>by <small class="author" itemprop="author">Author {i}</small>
+        <a href="/author/Author-{i}">(about)</a></span>
+        <div class="tags">Tags: {tags}</div>
+    </div>''')
+    next_link = f'<li class="next"><a href="/page/{n + 1}/">Next <span aria-hidden="true">&rarr;</span></a></li>' if n < pages else ''
+    top_tags = ''.join(f'<span class="tag-item"><a class="tag" href="/tag/t{j}/">t{j}</a></span>' for j in range(10))
+    return f'''<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><title>Quotes to Scrape</title></head>
+<body><div class="container"><div class="row header-box"><h1><a href="/">Quotes to Scrape</a></h1></div>
+<div class="row"><div class="col-md-8">{''.join(quotes)}
+<nav><ul class="pager">{next_link}</ul></nav></div>
+<div class="col-md-4 tags-box"><h2>Top Ten tags</h2>{top_tags}</div></div></div>
+<footer class="footer"><div class="container">Quotes by GoodReads.com</div></footer></body></html>'''
+
+
+def books_listing(n, pages=BOOK_PAGES, prefix=''):
+    """A page shaped like books.toscrape.com/catalogue/page-N.html; `prefix` makes the root page variant."""
+    articles = []
+    for i in range(BOOKS_PER_PAGE):
+        slug = f'book-{n}-{i}_{n * BOOKS_PER_PAGE + i}'
+        title = escape(f'Book {n}-{i}: A Tale & More')
+        articles.append(f'''<li class="col-xs-6 col-sm-4 col-md-3 col-lg-3">
+    <article class="product_pod">
+        <div class="image_container"><a href="{prefix}{slug}/index.html"><img src="../media/{slug}.jpg" alt="{title}" class="thumbnail"></a></div>
+        <p class="star-rating {RATINGS[(n + i) % 5]}"><i class="icon-star"></i><i class="icon-star"></i></p>
+        <h3><a href="{prefix}{slug}/index.html" title="{title}">{title[:20]}...</a></h3>
+        <div class="product_price">
+            <p class="price_color">£{10 + (n * 7 + i * 3) % 50}.{(n + i) % 100:02d}</p>
+            <p class="instock availability">
+    <i class="icon-ok"></i>
+        In stock
+</p>
+            <form><button type="submit" class="btn btn-primary btn-block">Add to basket</button></form>
+        </div>
+    </article>
+</li>''')
+    categories = ''.join(f'<li><a href="{prefix}category/books/c{j}/index.html">Category {j}</a></li>' for j in range(50))
+    previous_link = f'<li class="previous"><a href="{prefix}page-{n - 1}.html">previous</a></li>' if n > 1 else ''
+    next_link = f'<li class="next"><a href="{prefix}page-{n + 1}.html">next</a></li>' if n < pages else ''
+    return f'''<!DOCTYPE html><html lang="en-us"><head><meta charset="utf-8"><title>All products | Books to Scrape</title></head>
+<body id="default" class="default"><header class="header container-fluid"><div class="page_inner"><div class="row">
+<div class="col-sm-8 h1"><a href="/index.html">Books to Scrape</a></div></div></div></header>
+<div class="container-fluid page"><div class="page_inner"><div class="row">
+<aside class="sidebar col-sm-4 col-md-3"><div class="side_categories"><ul class="nav nav-list"><li><a href="#">Books</a><ul>{categories}</ul></li></ul></div></aside>
+<div class="col-sm-8 col-md-9"><div class="page-header action"><h1>All products</h1></div>
+<section><div><ol class="row">{''.join(articles)}</ol>
+<div><ul class="pager">{previous_link}<li class="current">
+    Page {n} of {pages}
+</li>{next_link}</ul></div></div></section></div></div></div></div>
+<footer class="footer container-fluid"></footer></body></html>'''
+
+
+def book_detail(slug):
+    """A page shaped like books.toscrape.com/catalogue/<slug>/index.html."""
+    number = int(slug.rsplit('_', 1)[-1]) if slug.rsplit('_', 1)[-1].isdigit() else 0
+    rows = [('UPC', f'{number:016x}'), ('Product Type', 'Books'),
+            ('Price (excl. tax)', f'£{10 + number % 50}.00'), ('Price (incl. tax)', f'£{10 + number % 50}.00'),
+            ('Tax', '£0.00'), ('Availability', f'In stock ({number % 23} available)'), ('Number of reviews', '0')]
+    table = ''.join(f'<tr><th>{key}</th><td>{value}</td></tr>' for key, value in rows)
+    return f'''<!DOCTYPE html><html lang="en-us"><head><meta charset="utf-8"><title>{escape(slug)} | Books to Scrape</title></head>
+<body id="default" class="default"><div class="container-fluid page"><div class="page_inner">
+<article class="product_page"><div class="row"><div class="col-sm-6 product_main"><h1>{escape(slug)}</h1>
+<p class="price_color">£{10 + number % 50}.00</p></div></div>
+<div id="product_description" class="sub-header"><h2>Product Description</h2></div>
+<p>A long description of {escape(slug)}. {'Lorem ipsum dolor sit amet. ' * 20}...more</p>
+<div class="sub-header"><h2>Product Information</h2></div>
+<table class="table table-striped">{table}</table></article></div></div></body></html>'''
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops SYNs under concurrent load, which shows up as 1s+ tail latency.
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up mid-handshake (certificate audits, rejected
+        # self-signed certificates) are expected, not server errors.
+        if not isinstance(sys.exc_info()[1], (ssl.SSLError, ConnectionError)):
+            super().handle_error(request, client_address)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffer the response so headers and body leave in one write instead of
+    # two small segments that stall on delayed ACKs.
+    wbufsize = 64 * 1024
+    latency = 0.0
+    jitter = 0.0
+    capacity = None  # requests served at once before answering 503 + Retry-After
+    retry_after = 1
+    conditional = True  # answer If-None-Match with 304
+    allow_head = True  # False answers HEAD with 405, like servers that only route GET
+    ranges = True  # honour 'Range: bytes=a-b'
+    slow_rate = 0.0  # share of requests held for slow_latency on top of the usual delay
+    slow_latency = 0.0
+    failure_rate = 0.0  # share of requests answered with a bare 500
+    drop_rate = 0.0  # share of connections closed without any response
+    broken = ()  # paths that always answer 500
+    rng = random.Random(0)
+    lock = threading.Lock()
+    active = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def route(self):
+        path = self.path.split('?', 1)[0]
+        match = re.fullmatch(r'/page/(\d+)/', path)
+        if match:
+            return quotes_page(int(match.group(1)))
+        match = re.fullmatch(r'/catalogue/page-(\d+)\.html', path)
+        if match and 1 <= int(match.group(1)) <= BOOK_PAGES:
+            return books_listing(int(match.group(1)))
+        match = re.fullmatch(r'/catalogue/([^/]+)/index\.html', path)
+        if match:
+            return book_detail(match.group(1))
+        if path in ('/', '/index.html'):
+            return books_listing(1, prefix='catalogue/')
+        return None
+
+    def delay(self):
+        with self.lock:
+            delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+            if self.slow_rate and self.rng.random() < self.slow_rate:
+                delay += self.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def fault(self):
+        """'drop' or 'fail' when this request should break, None to serve it."""
+        if self.path.split('?', 1)[0] in self.broken:
+            return 'fail'
+        with self.lock:
+            roll = self.rng.random()
+        if roll < self.drop_rate:
+            return 'drop'
+        if roll < self.drop_rate + self.failure_rate:
+            return 'fail'
+        return None
+
+    def respond(self, send_body):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            overloaded = self.capacity is not None and cls.active > self.capacity
+        try:
+            if overloaded:
+                self.send_response(503)
+                self.send_header('Retry-After', str(self.retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.serve_page(send_body)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def serve_page(self, send_body):
+        self.delay()
+        fault = self.fault()
+        if fault == 'drop':
+            self.close_connection = True
+            return
+        if fault == 'fail':
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        html = self.route()
+        if html is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = html.encode('utf-8')
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.conditional and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', '')) if self.ranges else None
+        if match and int(match.group(1)) < len(body):
+            first = int(match.group(1))
+            last = min(int(match.group(2) or len(body) - 1), len(body) - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{len(body)}')
+            body = body[first:last + 1]
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', LAST_MODIFIED)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.respond(True)
+
+    def do_HEAD(self):
+        if not self.allow_head:
+            self.send_response(405)
+            self.send_header('Allow', 'GET')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.respond(False)
+
+
+def self_signed_cert(directory, hostname='localhost', days=30):
+    """Write a self-signed certificate and key for `hostname` (needs the openssl command); returns their paths.
+
+    A negative `days` gives a certificate that has already expired.
+    """
+    os.makedirs(directory, exist_ok=True)
+    certfile = os.path.join(directory, f'{hostname}.crt')
+    keyfile = os.path.join(directory, f'{hostname}.key')
+    request = subprocess.run(['openssl', 'req', '-new', '-newkey', 'rsa:2048', '-nodes', '-keyout', keyfile,
+                              '-subj', f'/CN={hostname}', '-addext', f'subjectAltName=DNS:{hostname}',
+                              '-addext', 'basicConstraints=critical,CA:TRUE'],
+                             check=True, capture_output=True).stdout
+    # x509 -req, unlike req -x509, accepts a negative number of days.
+    subprocess.run(['openssl', 'x509', '-req', '-signkey', keyfile, '-days', str(days),
+                    '-copy_extensions', 'copy', '-out', certfile], input=request, check=True, capture_output=True)
+    return certfile, keyfile
+
+
+def make_server(latency=0.0, jitter=0.0, port=0, seed=0, handler=FixtureHandler, certfile=None, keyfile=None,
+                **settings):
+    """A threaded fixture server, not yet serving; `settings` override FixtureHandler attributes such as capacity.
+
+    With a certfile the server speaks HTTPS.
+    """
+    for name in settings:
+        if not hasattr(handler, name):
+            raise TypeError(f"Unknown fixture setting {name!r}")
+    handler = type('ConfiguredHandler', (handler,), {
+        'latency': latency, 'jitter': jitter, 'rng': random.Random(seed),
+        'lock': threading.Lock(), 'active': 0, **settings})
+    server = FixtureServer(('127.0.0.1', port), handler)
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        # Handshake on the handler thread, not in the accept loop.
+        server.socket = context.wrap_socket(server.socket, server_side=True, do_handshake_on_connect=False)
+    return server
+
+
+def base_url(server):
+    if isinstance(server.socket, ssl.SSLSocket):
+        return f'https://localhost:{server.server_port}/'
+    return f'http://127.0.0.1:{server.server_port}/'
+
+
+def serve_in_thread(latency=0.0, jitter=0.0, **kwargs):
+    """Start a fixture server on a background thread and return (server, base_url)."""
+    server = make_server(latency, jitter, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url(server)
+
+
+def _serve_forever(latency, jitter, seed, settings, conn):
+    server = make_server(latency, jitter, seed=seed, **settings)
+    conn.send(base_url(server))
+    server.serve_forever()
+
+
+def serve_in_process(latency=0.0, jitter=0.0, seed=0, **settings):
+    """Start a fixture server in its own process, so it does not share the GIL with the code under test."""
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve_forever, args=(latency, jitter, seed, settings, child_conn),
+                                      daemon=True)
+    process.start()
+    return process, parent_conn.recv()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Serve local copies of the toscrape sites.")
+    arg_parser.add_argument('--port', type=int, default=8000)
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    arg_parser.add_argument('--jitter', type=float, default=0.0, help="+/- seconds of random extra latency")
+    arg_parser.add_argument('--capacity', type=int, help="concurrent requests before answering 503")
+    arg_parser.add_argument('--slow-rate', type=float, default=0.0, help="share of requests delayed by --slow-latency")
+    arg_parser.add_argument('--slow-latency', type=float, default=0.0)
+    arg_parser.add_argument('--failure-rate', type=float, default=0.0, help="share of requests answered with 500")
+    arg_parser.add_argument('--drop-rate', type=float, default=0.0, help="share of connections closed unanswered")
+    arg_parser.add_argument('--certfile', help="serve HTTPS with this certificate")
+    arg_parser.add_argument('--keyfile')
+    args = arg_parser.parse_args()
+    server = make_server(args.latency, args.jitter, args.port, certfile=args.certfile, keyfile=args.keyfile,
+                         capacity=args.capacity, slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+                         failure_rate=args.failure_rate, drop_rate=args.drop_rate)
+    print(f"Serving on {base_url(server)}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
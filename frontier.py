@@ -0,0 +1,205 @@
+import json
+import sqlite3
+import threading
+import time
+
+from items import from_json, to_json
+
+PENDING = 'pending'
+DONE = 'done'
+LEASED = 'leased'
+FAILED = 'failed'
+LEASE_SECONDS = 60  # a shard goes back to the queue if its worker has not renewed it for this long
+MAX_ATTEMPTS = 3  # leases of a shard before it is marked failed
+
+
+class CrawlFrontier:
+    """SQLite-backed record of pending and visited URLs plus what was extracted from each."""
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        # WAL with synchronous=NORMAL keeps each checkpoint to a single cheap append.
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT UNIQUE,
+            status TEXT, result TEXT)""")
+        self.db.commit()
+
+    def add(self, urls):
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO pages (url, status) VALUES (?, ?)",
+                                [(url, PENDING) for url in urls])
+
+    def next_pending(self):
+        row = self.db.execute("SELECT url FROM pages WHERE status = ? ORDER BY seq LIMIT 1",
+                              (PENDING,)).fetchone()
+        return row[0] if row else None
+
+    def complete(self, url, result, new_urls=()):
+        """Store a page's result and queue the links it led to, atomically."""
+        with self.db:
+            self.db.execute("UPDATE pages SET status = ?, result = ? WHERE url = ?",
+                            (DONE, json.dumps(result, ensure_ascii=False, default=to_json), url))
+            self.db.executemany("INSERT OR IGNORE INTO pages (url, status) VALUES (?, ?)",
+                                [(new_url, PENDING) for new_url in new_urls])
+
+    def fail(self, url):
+        """Set a page aside after a failed fetch; requeue_failed() puts it back for the next run."""
+        with self.db:
+            self.db.execute("UPDATE pages SET status = ? WHERE url = ?", (FAILED, url))
+
+    def requeue_failed(self):
+        """Make every failed page pending again; returns how many there were."""
+        with self.db:
+            return self.db.execute("UPDATE pages SET status = ? WHERE status = ?", (PENDING, FAILED)).rowcount
+
+    def count(self, status=DONE):
+        return self.db.execute("SELECT COUNT(*) FROM pages WHERE status = ?", (status,)).fetchone()[0]
+
+    def results(self):
+        rows = self.db.execute("SELECT url, result FROM pages WHERE status = ? ORDER BY seq", (DONE,))
+        return [(url, json.loads(result, object_hook=from_json)) for url, result in rows]
+
+    def reset(self):
+        with self.db:
+            self.db.execute("DELETE FROM pages")
+
+    def close(self):
+        self.db.close()
+
+
+class ShardQueue:
+    """SQLite work queue of URL shards that crawl workers lease, in one or several processes.
+
+    Any process that opens the same file can take part (other hosts too, if
+    the file is on storage they share and that honours SQLite's locking).
+    A lease lasts `lease_seconds` unless renewed, so the shard of a worker
+    that died is leased again by another once it expires. Results are stored
+    with the shard's completion and only by the worker that holds the lease,
+    so every shard's results are kept exactly once. Calls may come from
+    several threads (asyncio.to_thread) and are serialised on one lock.
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode, so lease() can take the write lock up front with BEGIN IMMEDIATE.
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY)")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS shards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, urls TEXT, status TEXT, owner TEXT,
+            lease_until REAL, attempts INTEGER DEFAULT 0, result TEXT, error TEXT)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS shards_status ON shards (status, id)")
+
+    def _transaction(self):
+        return _Immediate(self.db, self.lock)
+
+    def add(self, urls, shard_size):
+        """Queue the URLs not seen before, `shard_size` to a shard; returns the number of new shards."""
+        with self._transaction():
+            new = [url for url in urls
+                   if self.db.execute("INSERT OR IGNORE INTO urls VALUES (?)", (url,)).rowcount]
+            shards = [new[i:i + shard_size] for i in range(0, len(new), shard_size)]
+            self.db.executemany("INSERT INTO shards (urls, status) VALUES (?, ?)",
+                                [(json.dumps(shard), PENDING) for shard in shards])
+        return len(shards)
+
+    def lease(self, owner):
+        """(shard id, urls) of the oldest shard that is pending or whose lease expired, or None."""
+        now = time.time()
+        with self._transaction():
+            self.db.execute("UPDATE shards SET status = ?, error = COALESCE(error, 'lease expired') "
+                            "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                            (FAILED, LEASED, now, self.max_attempts))
+            row = self.db.execute("SELECT id, urls FROM shards WHERE status = ? OR (status = ? AND lease_until < ?) "
+                                  "ORDER BY id LIMIT 1", (PENDING, LEASED, now)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE shards SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1 "
+                            "WHERE id = ?", (LEASED, owner, now + self.lease_seconds, row[0]))
+        return row[0], json.loads(row[1])
+
+    def renew(self, shard_id, owner):
+        """Extend a lease; False if the shard is no longer leased to `owner`."""
+        with self._transaction():
+            return self.db.execute("UPDATE shards SET lease_until = ? WHERE id = ? AND status = ? AND owner = ?",
+                                   (time.time() + self.lease_seconds, shard_id, LEASED, owner)).rowcount == 1
+
+    def complete(self, shard_id, owner, result, new_urls=(), shard_size=1, error=None):
+        """Store a shard's result and queue the URLs it discovered; False if the lease was lost.
+
+        `error` notes what is missing from a partial result, such as the pages that could not be fetched.
+        """
+        # Books go in tagged, so results() hands back Book records rather than plain dicts.
+        stored = json.dumps(result, ensure_ascii=False, default=to_json)
+        with self._transaction():
+            done = self.db.execute("UPDATE shards SET status = ?, result = ?, error = ?, lease_until = NULL "
+                                   "WHERE id = ? AND status = ? AND owner = ?",
+                                   (DONE, stored, error, shard_id, LEASED, owner)).rowcount
+        if done and new_urls:
+            self.add(new_urls, shard_size)
+        return done == 1
+
+    def release(self, shard_id, owner, error):
+        """Give a shard back after an error; it fails for good after max_attempts leases."""
+        with self._transaction():
+            self.db.execute("UPDATE shards SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                            "error = ?, lease_until = NULL WHERE id = ? AND status = ? AND owner = ?",
+                            (self.max_attempts, FAILED, PENDING, error, shard_id, LEASED, owner))
+
+    def counts(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT status, COUNT(*) FROM shards GROUP BY status").fetchall())
+
+    def finished(self):
+        """True once no shard is pending or leased."""
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM shards WHERE status IN (?, ?)",
+                                   (PENDING, LEASED)).fetchone()[0] == 0
+
+    def results(self):
+        """(shard id, result) of every done shard, in the order the shards were queued."""
+        rows = self.db.execute("SELECT id, result FROM shards WHERE status = ? ORDER BY id", (DONE,))
+        return [(shard_id, json.loads(result, object_hook=from_json)) for shard_id, result in rows]
+
+    def failures(self):
+        return self.db.execute("SELECT id, urls, error FROM shards WHERE status = ? ORDER BY id",
+                               (FAILED,)).fetchall()
+
+    def partial(self):
+        """(shard id, error) of every done shard that completed without some of its pages."""
+        return self.db.execute("SELECT id, error FROM shards WHERE status = ? AND error IS NOT NULL ORDER BY id",
+                               (DONE,)).fetchall()
+
+    def close(self):
+        self.db.close()
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error) on an autocommit connection, holding `lock` throughout."""
+
+    def __init__(self, db, lock):
+        self.db = db
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+        return False
@@ -0,0 +1,380 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import metrics
+import page_archive
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlsplit
+from sessions import shared_session
+
+CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', '.http_cache')
+MAX_BYTES = 200 * 1024 * 1024  # bodies kept on disk before least recently used ones are evicted
+# Probe cached URLs with HEAD before downloading them: 'auto' only for hosts
+# seen answering a conditional GET with the unchanged body, '1' always, '0' never.
+PROBE = os.environ.get('HTTP_PROBE', 'auto')
+EVICT_BATCH = 32  # least recently used entries read per eviction query
+
+
+class CachedResponse:
+    """The parts of a response the scrapers use, whether it came from the network or from disk."""
+
+    def __init__(self, url, status_code, headers, content, encoding, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        # Case-insensitive like requests' and aiohttp's own headers, also when loaded from the index.
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.encoding = encoding
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class HttpCache:
+    """Persistent response cache keyed by URL, revalidated with ETag / Last-Modified."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'),
+                                  timeout=30, check_same_thread=False)
+        # So that INSERT OR REPLACE fires the delete trigger for the row it replaces.
+        self.db.execute("PRAGMA recursive_triggers = ON")
+        # The triggers keep the total size of the bodies in `totals`, so a store
+        # learns whether to evict without summing the table, whichever process
+        # sharing the directory wrote the rows.
+        self.db.executescript("""
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY, filename TEXT, etag TEXT, last_modified TEXT,
+                encoding TEXT, headers TEXT, size INTEGER, accessed REAL);
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+            CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER);
+            INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+            CREATE TRIGGER IF NOT EXISTS entries_added AFTER INSERT ON entries
+                BEGIN UPDATE totals SET bytes = bytes + NEW.size; END;
+            CREATE TRIGGER IF NOT EXISTS entries_removed AFTER DELETE ON entries
+                BEGIN UPDATE totals SET bytes = bytes - OLD.size; END;
+            COMMIT;""")
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self.probes = 0
+        self.probe_skips = 0
+        self.probe_hosts = set()  # hosts whose cached URLs are probed before a GET
+        self.head_ignored = set()  # hosts probed with a one-byte Range GET instead of HEAD
+        self.unprobeable = set()  # hosts that ignore HEAD and Range alike, so a probe costs a full GET
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def validators(self, url):
+        """Conditional request headers for `url`, empty if nothing is cached."""
+        with self.lock:
+            row = self.db.execute("SELECT etag, last_modified FROM entries WHERE url = ?",
+                                  (url,)).fetchone()
+        headers = {}
+        if row:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def headers(self, url):
+        """Response headers stored with the cached copy of `url`, None if there is none."""
+        with self.lock:
+            row = self.db.execute("SELECT headers FROM entries WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def should_probe(self, url, probe=None):
+        """Whether to probe a cached `url` before downloading it (`probe` overrides PROBE)."""
+        probe = PROBE if probe is None else probe
+        host = urlsplit(url).netloc
+        if probe in (False, '0') or host in self.unprobeable:
+            return False
+        return probe != 'auto' or host in self.probe_hosts
+
+    def check_conditional(self, url, cached_headers, status, headers):
+        """Start probing a host that sent a full 200 for a version we already had."""
+        if status == 200 and cached_headers is not None and not changed(cached_headers, headers):
+            self.probe_hosts.add(urlsplit(url).netloc)
+
+    def load(self, url):
+        with self.lock:
+            row = self.db.execute("SELECT filename, encoding, headers FROM entries WHERE url = ?",
+                                  (url,)).fetchone()
+            if not row:
+                return None
+            try:
+                with open(self._path(row[0]), 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE entries SET accessed = ? WHERE url = ?", (time.time(), url))
+            self.db.commit()
+        self.hits += 1
+        self.bytes_saved += len(content)
+        return CachedResponse(url, 200, json.loads(row[2]), content, row[1], from_cache=True)
+
+    def store(self, url, headers, content, encoding):
+        self.misses += 1
+        self.bytes_downloaded += len(content)
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            # Nothing to revalidate with, so a cached copy could never be reused.
+            return
+        filename = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        with self.lock:
+            with open(self._path(filename), 'wb') as f:
+                f.write(content)
+            self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (url, filename, etag, last_modified, encoding,
+                             json.dumps(dict(headers)), len(content), time.time()))
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        excess = self.db.execute("SELECT bytes FROM totals").fetchone()[0] - self.max_bytes
+        while excess > 0:
+            rows = self.db.execute("SELECT url, filename, size FROM entries ORDER BY accessed LIMIT ?",
+                                   (EVICT_BATCH,)).fetchall()
+            if not rows:
+                break
+            for url, filename, size in rows:
+                if excess <= 0:
+                    break
+                self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                try:
+                    os.remove(self._path(filename))
+                except FileNotFoundError:
+                    pass
+                excess -= size
+
+    def stats(self):
+        return {
+            'not_modified': self.hits,
+            'downloaded': self.misses,
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_saved': self.bytes_saved,
+            'probes': self.probes,
+            'gets_avoided': self.probe_skips,
+        }
+
+    def close(self):
+        self.db.close()
+
+
+_cache = None
+_cache_pid = None
+
+
+def default_cache():
+    """The process-wide cache; worker processes each open their own connection."""
+    global _cache, _cache_pid
+    if _cache is None or _cache_pid != os.getpid():
+        _cache = HttpCache()
+        _cache_pid = os.getpid()
+    return _cache
+
+
+def _header(headers, name):
+    # Works for requests' and aiohttp's case-insensitive headers and for plain dicts loaded from the index.
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def content_length(headers):
+    """Full size of the resource, also when `headers` answer a Range request."""
+    content_range = _header(headers, 'Content-Range')
+    if content_range and '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    length = _header(headers, 'Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def changed(cached, current):
+    """Whether `current` response headers describe another version than the `cached` ones.
+
+    A different length always means changed; otherwise the ETag decides when
+    both have one, then Last-Modified. With no validator in common the
+    resource counts as changed.
+    """
+    old_length, new_length = content_length(cached), content_length(current)
+    if old_length is not None and new_length is not None and old_length != new_length:
+        return True
+    for name in ('ETag', 'Last-Modified'):
+        old, new = _header(cached, name), _header(current, name)
+        if old and new:
+            return old.removeprefix('W/') != new.removeprefix('W/')
+    return True
+
+
+def _describes(headers):
+    return any(_header(headers, name) for name in ('ETag', 'Last-Modified', 'Content-Length'))
+
+
+def _probe(http, url, cache):
+    """Headers of the current version of `url` without its body, None if the server won't say.
+
+    Uses HEAD, or a one-byte Range GET on hosts whose HEAD answers are unusable.
+    """
+    cache.probes += 1
+    host = urlsplit(url).netloc
+    if host not in cache.head_ignored:
+        response = http.head(url, allow_redirects=True)
+        if response.status_code == 200 and _describes(response.headers):
+            return response.headers
+        cache.head_ignored.add(host)
+    with http.get(url, headers={'Range': 'bytes=0-0'}, stream=True) as response:
+        if response.status_code == 206:
+            response.content  # one byte; reading it keeps the connection reusable
+            return response.headers
+        # A server that ignores Range starts sending the whole body: keep
+        # the headers and drop the connection rather than read it.
+        if response.status_code == 200:
+            cache.unprobeable.add(host)
+            return response.headers
+        return None
+
+
+def _archive(response):
+    # Record what the scrapers see, disk hits included, when PAGE_ARCHIVE is set.
+    archive = page_archive.default_archive()
+    if archive is not None:
+        archive.record(response.url, response.status_code, response.headers, response.content, response.encoding)
+    return response
+
+
+def get(url, session=None, cache=None, probe=None, **kwargs):
+    """requests-based GET that revalidates against the on-disk cache.
+
+    Cached URLs are probed first (see PROBE) and served from disk when the
+    probe shows them unchanged.
+    """
+    return _archive(_get(url, session, cache, probe, **kwargs))
+
+
+def _get(url, session, cache, probe, **kwargs):
+    cache = cache or default_cache()
+    http = session or shared_session()
+    cached_headers = cache.headers(url)
+    if cached_headers is not None and cache.should_probe(url, probe):
+        current = _probe(http, url, cache)
+        if current is not None and not changed(cached_headers, current):
+            cached = cache.load(url)
+            if cached is not None:
+                cache.probe_skips += 1
+                return cached
+    headers = {**kwargs.pop('headers', {}), **cache.validators(url)}
+    response = _timed_get(http, url, headers=headers, **kwargs)
+    if response.status_code == 304:
+        cached = cache.load(url)
+        if cached is not None:
+            return cached
+        response = _timed_get(http, url, **kwargs)
+    cache.check_conditional(url, cached_headers, response.status_code, response.headers)
+    encoding = response.encoding or response.apparent_encoding
+    if response.status_code == 200:
+        cache.store(url, response.headers, response.content, encoding)
+    return CachedResponse(url, response.status_code, response.headers,
+                          response.content, encoding)
+
+
+def _timed_get(http, url, **kwargs):
+    start = time.perf_counter()
+    response = http.get(url, **kwargs)
+    total = time.perf_counter() - start
+    # requests stops `elapsed` once the headers are parsed, before it reads the body.
+    ttfb = response.elapsed.total_seconds()
+    metrics.observe('http_ttfb_seconds', ttfb)
+    metrics.observe('http_body_seconds', max(0.0, total - ttfb))
+    metrics.observe('http_request_seconds', total)
+    return response
+
+
+async def _probe_async(session, url, cache):
+    """aiohttp version of _probe."""
+    cache.probes += 1
+    host = urlsplit(url).netloc
+    if host not in cache.head_ignored:
+        async with session.head(url, allow_redirects=True) as response:
+            if response.status == 200 and _describes(response.headers):
+                return response.headers
+        cache.head_ignored.add(host)
+    async with session.get(url, headers={'Range': 'bytes=0-0'}) as response:
+        if response.status == 206:
+            await response.read()
+            return response.headers
+        if response.status == 200:
+            cache.unprobeable.add(host)
+            response.close()
+            return response.headers
+    return None
+
+
+async def get_async(session, url, cache=None, probe=None, **kwargs):
+    """aiohttp-based GET that revalidates against the on-disk cache, probing first like get()."""
+    return _archive(await _get_async(session, url, cache, probe, **kwargs))
+
+
+async def _get_async(session, url, cache, probe, **kwargs):
+    cache = cache or default_cache()
+    cached_headers = cache.headers(url)
+    if cached_headers is not None and cache.should_probe(url, probe):
+        current = await _probe_async(session, url, cache)
+        if current is not None and not changed(cached_headers, current):
+            cached = cache.load(url)
+            if cached is not None:
+                cache.probe_skips += 1
+                return cached
+    headers = {**kwargs.pop('headers', {}), **cache.validators(url)}
+    start = time.perf_counter()
+    async with session.get(url, headers=headers, **kwargs) as response:
+        if response.status == 304:
+            cached = cache.load(url)
+            if cached is not None:
+                metrics.observe('http_request_seconds', time.perf_counter() - start)
+                return cached
+        else:
+            cache.check_conditional(url, cached_headers, response.status, response.headers)
+            content = await _timed_read(response, start)
+            return _store_async(cache, url, response, content)
+    start = time.perf_counter()
+    async with session.get(url, **kwargs) as response:
+        content = await _timed_read(response, start)
+        return _store_async(cache, url, response, content)
+
+
+async def _timed_read(response, start):
+    # TTFB comes from the session's trace config; this covers the body and the whole request.
+    headers_received = time.perf_counter()
+    content = await response.read()
+    end = time.perf_counter()
+    metrics.observe('http_body_seconds', end - headers_received)
+    metrics.observe('http_request_seconds', end - start)
+    return content
+
+
+def _store_async(cache, url, response, content):
+    try:
+        encoding = response.get_encoding()
+    except (RuntimeError, LookupError):
+        encoding = 'utf-8'
+    if response.status == 200:
+        cache.store(url, response.headers, content, encoding)
+    return CachedResponse(url, response.status, response.headers, content, encoding)
@@ -0,0 +1,204 @@
+import bisect
+import json
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Upper bounds in seconds, from sub-millisecond local work up to slow remote pages.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    'http_dns_seconds': 'DNS resolution per new connection',
+    'http_connect_seconds': 'TCP connect per new connection (includes TLS on the aiohttp path)',
+    'http_tls_seconds': 'TLS handshake per new connection',
+    'http_ttfb_seconds': 'Request sent to response headers received',
+    'http_body_seconds': 'Response headers to body fully read',
+    'http_request_seconds': 'Whole request',
+    'parse_seconds': 'HTML parsing per page',
+    'serialize_seconds': 'Writing one page of records',
+}
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Thread-safe set of named histograms."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                if name in DESCRIPTIONS:
+                    lines.append(f'# HELP {name} {DESCRIPTIONS[name]}')
+                lines.append(f'# TYPE {name} histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum {histogram.sum}')
+                lines.append(f'{name}_count {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        with self.lock:
+            return {name: {'buckets': list(histogram.buckets), 'counts': histogram.counts,
+                           'sum': histogram.sum, 'count': histogram.count,
+                           'mean': histogram.sum / histogram.count if histogram.count else None}
+                    for name, histogram in sorted(self.histograms.items())}
+
+    def write(self, prefix='metrics'):
+        """Write <prefix>.prom (Prometheus text format) and <prefix>.json."""
+        with open(f'{prefix}.prom', 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        with open(f'{prefix}.json', 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+REGISTRY = Registry()
+
+
+def observe(name, value):
+    REGISTRY.observe(name, value)
+
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - start)
+
+
+# requests path: connection classes that time DNS, TCP connect and TLS for each new connection.
+
+class TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        start = time.perf_counter()
+        dns_host = self._dns_host
+        try:
+            infos = socket.getaddrinfo(dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror:
+            # urllib3 resolves again and raises its own NameResolutionError.
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        self.dns_seconds = resolved - start
+        observe('http_dns_seconds', self.dns_seconds)
+        # Connect to the addresses just resolved instead of resolving twice,
+        # trying each in turn as create_connection does, so a host whose
+        # first (say IPv6) address is unreachable still connects.
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        try:
+            for n, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except ConnectTimeoutError:  # also NewConnectionError, its subclass
+                    if n == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+        self.tcp_seconds = time.perf_counter() - resolved
+        observe('http_connect_seconds', self.tcp_seconds)
+        return sock
+
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        self.dns_seconds = self.tcp_seconds = 0.0
+        super().connect()
+        # _new_conn already recorded DNS and TCP; whatever is left of connect() is the handshake.
+        elapsed = time.perf_counter() - start
+        observe('http_tls_seconds', max(0.0, elapsed - self.dns_seconds - self.tcp_seconds))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report DNS / connect / TLS timings."""
+
+    pool_classes = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(self.pool_classes)
+
+
+# aiohttp path: a TraceConfig recording the same phases.
+
+async def _on_request_start(session, ctx, params):
+    ctx.start = time.perf_counter()
+
+
+async def _on_dns_start(session, ctx, params):
+    ctx.dns_start = time.perf_counter()
+
+
+async def _on_dns_end(session, ctx, params):
+    observe('http_dns_seconds', time.perf_counter() - ctx.dns_start)
+
+
+async def _on_connection_start(session, ctx, params):
+    ctx.connect_start = time.perf_counter()
+
+
+async def _on_connection_end(session, ctx, params):
+    observe('http_connect_seconds', time.perf_counter() - ctx.connect_start)
+
+
+async def _on_request_end(session, ctx, params):
+    observe('http_ttfb_seconds', time.perf_counter() - ctx.start)
+
+
+def trace_config():
+    """aiohttp TraceConfig feeding the registry; pass it to ClientSession(trace_configs=[...])."""
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(_on_request_start)
+    config.on_dns_resolvehost_start.append(_on_dns_start)
+    config.on_dns_resolvehost_end.append(_on_dns_end)
+    config.on_connection_create_start.append(_on_connection_start)
+    config.on_connection_create_end.append(_on_connection_end)
+    config.on_request_end.append(_on_request_end)
+    return config
@@ -0,0 +1,419 @@
+import argparse
+import hashlib
+import importlib
+import json
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised between threads
+    fcntl = None
+
+ARCHIVE_DIR = os.environ.get('PAGE_ARCHIVE')  # record every fetched response here when set
+SEGMENT_BYTES = 256 * 1024 * 1024  # segment files roll over at this size
+LEVEL = 3  # zstd compression level
+# Pages of one site share most of their markup, which a per-record frame
+# cannot exploit on its own: after DICT_SAMPLES records a zstd dictionary is
+# trained from them and used for every later record (~6x smaller on the fixtures).
+DICT_SAMPLES = 200
+DICT_BYTES = 64 * 1024
+CHUNK = 256  # records per replay task
+MAGIC = b'PGA1'
+# Each record is MAGIC, the frame length, then one compressed frame holding
+# the metadata length, metadata JSON (url, status, headers, ...) and the body.
+# zstd frames name the dictionary they need, stored next to the segments as dict-<id>.zdict.
+HEADER = struct.Struct('<4sI')
+META_LEN = struct.Struct('<I')
+CODECS = {'.zst': 'zstd', '.zz': 'zlib'}
+
+_dictionaries = {}
+
+
+def _dictionary(directory, dict_id):
+    key = (directory, dict_id)
+    if key not in _dictionaries:
+        with open(os.path.join(directory, f'dict-{dict_id}.zdict'), 'rb') as f:
+            _dictionaries[key] = zstandard.ZstdCompressionDict(f.read())
+    return _dictionaries[key]
+
+
+def _decompress(frame, codec, directory):
+    if codec == 'zlib':
+        return zlib.decompress(frame)
+    if zstandard is None:
+        raise RuntimeError("this archive segment is zstd-compressed; install the zstandard package")
+    dict_id = zstandard.get_frame_parameters(frame).dict_id
+    if dict_id:
+        return zstandard.ZstdDecompressor(dict_data=_dictionary(directory, dict_id)).decompress(frame)
+    return zstandard.ZstdDecompressor().decompress(frame)
+
+
+class Record(namedtuple('Record', 'url status headers content encoding fetched')):
+    """One archived response; has the same url/status_code/headers/content/text as http_cache responses."""
+
+    @property
+    def status_code(self):
+        return self.status
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+def _payload(url, status, headers, content, encoding, fetched):
+    meta = json.dumps({'url': url, 'status': status, 'headers': dict(headers),
+                       'encoding': encoding, 'fetched': fetched}).encode('utf-8')
+    return META_LEN.pack(len(meta)) + meta + content
+
+
+def decode_record(buffer, offset, codec, directory):
+    """(Record, offset of the next record) for the record starting at `offset` of a segment."""
+    magic, size = HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC:
+        raise ValueError(f"no archive record at offset {offset}")
+    start = offset + HEADER.size
+    data = _decompress(buffer[start:start + size], codec, directory)
+    (meta_len,) = META_LEN.unpack_from(data)
+    meta = json.loads(data[META_LEN.size:META_LEN.size + meta_len])
+    content = data[META_LEN.size + meta_len:]
+    record = Record(meta['url'], meta['status'], CaseInsensitiveDict(meta['headers']), content, meta['encoding'],
+                    meta['fetched'])
+    return record, start + size
+
+
+def iter_segment(path):
+    """(offset, size, Record) for every complete record of a segment file, in order."""
+    codec = CODECS[os.path.splitext(path)[1]]
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        offset = 0
+        while offset + HEADER.size <= len(buffer):
+            magic, size = HEADER.unpack_from(buffer, offset)
+            if magic != MAGIC or offset + HEADER.size + size > len(buffer):
+                break  # a record cut short by a crash mid-append
+            record, next_offset = decode_record(buffer, offset, codec, os.path.dirname(path))
+            yield offset, next_offset - offset, record
+            offset = next_offset
+
+
+class PageArchive:
+    """Append-only archive of responses in compressed segment files, with a SQLite offset index.
+
+    Every record is its own compressed frame, so one page can be read back
+    from its (segment, offset) without touching the rest. A response whose
+    body matches the last one archived for its URL is not stored again.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.codec = 'zstd' if zstandard is not None else 'zlib'
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), timeout=30, check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY, url TEXT, status INTEGER, segment TEXT, offset INTEGER,
+            size INTEGER, digest TEXT, fetched REAL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_url ON records (url, id)")
+        self.db.commit()
+        self.recorded = 0
+        self.duplicates = 0
+        self._samples = []  # payloads kept to train a dictionary from, None once there is one
+        self._compressor = None
+        if self.codec == 'zstd':
+            self._use_dictionary(self._latest_dictionary())
+
+    def _path(self, segment):
+        return os.path.join(self.directory, segment)
+
+    def _current_segment(self):
+        suffix = {codec: ext for ext, codec in CODECS.items()}[self.codec]
+        segments = sorted(name for name in os.listdir(self.directory) if name.startswith('segment-'))
+        if segments and segments[-1].endswith(suffix) and \
+                os.path.getsize(self._path(segments[-1])) < self.segment_bytes:
+            return segments[-1]
+        return f'segment-{len(segments):05d}{suffix}'
+
+    def _latest_dictionary(self):
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.startswith('dict-') and name.endswith('.zdict')]
+        if not paths:
+            return None
+        dict_id = int(os.path.basename(max(paths, key=os.path.getmtime))[5:-6])
+        return _dictionary(self.directory, dict_id)
+
+    def _use_dictionary(self, dictionary):
+        if dictionary is None:
+            self._compressor = zstandard.ZstdCompressor(level=LEVEL)
+            return
+        self._compressor = zstandard.ZstdCompressor(level=LEVEL, dict_data=dictionary)
+        self._samples = None
+
+    def _learn(self, payload):
+        if self._samples is None or self.codec != 'zstd':
+            return
+        self._samples.append(payload)
+        if len(self._samples) < DICT_SAMPLES:
+            return
+        # Another process appending to the archive may have trained one already.
+        dictionary = self._latest_dictionary()
+        if dictionary is None:
+            try:
+                dictionary = zstandard.train_dictionary(DICT_BYTES, self._samples, level=LEVEL)
+            except zstandard.ZstdError:
+                self._samples = None  # too little material; keep compressing without one
+                return
+            path = os.path.join(self.directory, f'dict-{dictionary.dict_id()}.zdict')
+            with open(path + '.tmp', 'wb') as f:
+                f.write(dictionary.as_bytes())
+            os.replace(path + '.tmp', path)
+        self._use_dictionary(dictionary)
+
+    def _compress(self, payload):
+        if self.codec == 'zlib':
+            return zlib.compress(payload, 6)
+        return self._compressor.compress(payload)
+
+    def record(self, url, status, headers, content, encoding=None, fetched=None):
+        """Append one response; returns False if it duplicates the URL's last archived body."""
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        with self.lock:
+            row = self.db.execute("SELECT digest, status FROM records WHERE url = ? ORDER BY id DESC LIMIT 1",
+                                  (url,)).fetchone()
+            if row == (digest, status):
+                self.duplicates += 1
+                return False
+        fetched = fetched or time.time()
+        payload = _payload(url, status, headers, content, encoding, fetched)
+        with self.lock:
+            # Compressors are not thread-safe, and compressing is quick next to fetching.
+            frame = self._compress(payload)
+            data = HEADER.pack(MAGIC, len(frame)) + frame
+            segment = self._current_segment()
+            with open(self._path(segment), 'ab') as f:
+                if fcntl is not None:
+                    # Other processes may append to the same segment.
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+                self.db.execute("INSERT INTO records (url, status, segment, offset, size, digest, fetched) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (url, status, segment, offset, len(data), digest, fetched))
+                self.db.commit()
+            self.recorded += 1
+            self._learn(payload)
+        return True
+
+    def entries(self, pattern=None, latest=True, status=200):
+        """Index rows (segment, offset, url) in archive order, optionally only each URL's latest version."""
+        with self.lock:
+            if latest:
+                rows = self.db.execute("""SELECT segment, offset, url, status FROM records
+                    WHERE id IN (SELECT MAX(id) FROM records GROUP BY url) ORDER BY id""").fetchall()
+            else:
+                rows = self.db.execute("SELECT segment, offset, url, status FROM records ORDER BY id").fetchall()
+        regex = re.compile(pattern) if pattern else None
+        return [(segment, offset, url) for segment, offset, url, row_status in rows
+                if (status is None or row_status == status) and (regex is None or regex.search(url))]
+
+    def read(self, url):
+        """The latest archived response for `url`, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT segment, offset FROM records WHERE url = ? ORDER BY id DESC LIMIT 1",
+                                  (url,)).fetchone()
+        if row is None:
+            return None
+        with open(self._path(row[0]), 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return decode_record(buffer, row[1], CODECS[os.path.splitext(row[0])[1]], self.directory)[0]
+
+    def reindex(self):
+        """Rebuild the index by scanning the segments, e.g. after losing index.sqlite."""
+        with self.lock:
+            self.db.execute("DELETE FROM records")
+            for segment in sorted(name for name in os.listdir(self.directory) if name.startswith('segment-')):
+                for offset, size, record in iter_segment(self._path(segment)):
+                    digest = hashlib.blake2b(record.content, digest_size=16).hexdigest()
+                    self.db.execute("INSERT INTO records (url, status, segment, offset, size, digest, fetched) "
+                                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    (record.url, record.status, segment, offset, size, digest, record.fetched))
+            self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            count, urls = self.db.execute("SELECT COUNT(*), COUNT(DISTINCT url) FROM records").fetchone()
+        size = sum(os.path.getsize(self._path(name)) for name in os.listdir(self.directory)
+                   if name.startswith('segment-'))
+        return {'records': count, 'urls': urls, 'bytes': size,
+                'recorded': self.recorded, 'duplicates': self.duplicates}
+
+    def close(self):
+        self.db.close()
+
+
+_archive = None
+_archive_pid = None
+_archive_lock = threading.Lock()
+
+
+def default_archive():
+    """The process-wide archive when PAGE_ARCHIVE is set, else None."""
+    global _archive, _archive_pid
+    if ARCHIVE_DIR is None:
+        return None
+    with _archive_lock:
+        if _archive is None or _archive_pid != os.getpid():
+            _archive = PageArchive(ARCHIVE_DIR)
+            _archive_pid = os.getpid()
+        return _archive
+
+
+# Extractors replay can run by name: (module, function, whether it takes the
+# page URL after the HTML, URLs it applies to).
+EXTRACTORS = {
+    'books_async.listing': ('books_async_scraper', 'parse_page', True, r'/catalogue/page-\d+\.html$'),
+    'task2ABS.listing': ('task2ABS', 'parse_listing', True, r'/catalogue/page-\d+\.html$'),
+    'task2ABS.details': ('task2ABS', 'parse_book_details', False, r'/catalogue/[^/]+/index\.html$'),
+    'task3.listing': ('task3', 'parse_page', True, r'/catalogue/page-\d+\.html$'),
+    'quotes': ('quotes_scraper', 'parse_quotes', False, r'/page/\d+/$'),
+}
+
+_maps = {}
+
+
+def _segment_buffer(path, end):
+    # Each worker maps a segment once and keeps it for the tasks that follow,
+    # mapping it again only if the segment has grown past `end` since.
+    buffer = _maps.get(path)
+    if buffer is None or len(buffer) < end:
+        with open(path, 'rb') as f:
+            buffer = _maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return buffer
+
+
+def _replay_chunk(directory, segment, offsets, extractor):
+    module, function, takes_url = extractor
+    func = getattr(importlib.import_module(module), function)
+    path = os.path.join(directory, segment)
+    buffer = _segment_buffer(path, max(offsets) + HEADER.size)
+    codec = CODECS[os.path.splitext(segment)[1]]
+    results = []
+    for offset in offsets:
+        record, _ = decode_record(buffer, offset, codec, directory)
+        try:
+            result = func(record.text, record.url) if takes_url else func(record.text)
+            results.append((record.url, result, None))
+        except Exception as e:
+            # One page the new extractor cannot handle should not lose the rest.
+            results.append((record.url, None, f'{type(e).__name__}: {e}'))
+    return results
+
+
+def _chunks(entries, size):
+    # Consecutive records of the same segment, at most `size` per task.
+    chunk, segment = [], None
+    for entry_segment, offset, _ in entries:
+        if chunk and (entry_segment != segment or len(chunk) == size):
+            yield segment, chunk
+            chunk = []
+        segment = entry_segment
+        chunk.append(offset)
+    if chunk:
+        yield segment, chunk
+
+
+def replay(archive, extractor, pattern=None, workers=None, latest=True, chunk=CHUNK):
+    """Run `extractor` over archived pages on all cores; yields (url, result, error) in archive order.
+
+    `extractor` is a name from EXTRACTORS or (module, function, takes_url);
+    a named extractor defaults to the URLs it applies to. Results are
+    not memoised, since replay is for running extractors that changed.
+    Two chunks per worker are in flight at a time, so the results waiting
+    to be yielded stay bounded however large the archive.
+    """
+    if isinstance(extractor, str):
+        module, function, takes_url, default_pattern = EXTRACTORS[extractor]
+        extractor = (module, function, takes_url)
+        pattern = pattern or default_pattern
+    getattr(importlib.import_module(extractor[0]), extractor[1])  # fail here rather than in every worker
+    entries = archive.entries(pattern, latest)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        tasks = deque()
+        try:
+            for segment, offsets in _chunks(entries, chunk):
+                tasks.append(pool.submit(_replay_chunk, archive.directory, segment, offsets, extractor))
+                if len(tasks) >= 2 * workers:
+                    yield from tasks.popleft().result()
+            while tasks:
+                yield from tasks.popleft().result()
+        finally:
+            # A caller that stops early leaves chunks nobody will read.
+            for task in tasks:
+                task.cancel()
+
+
+def _extractor_spec(name, takes_url):
+    if name in EXTRACTORS:
+        return name
+    module, _, function = name.partition(':')
+    if not function:
+        raise SystemExit(f"unknown extractor {name!r}: use one of {', '.join(EXTRACTORS)} or module:function")
+    return module, function, takes_url
+
+
+def main():
+    from writers import open_writer
+
+    arg_parser = argparse.ArgumentParser(description="Inspect a page archive or re-run an extractor over it offline.")
+    arg_parser.add_argument('directory', nargs='?', default=ARCHIVE_DIR or 'page_archive')
+    arg_parser.add_argument('--extractor', help=f"one of {', '.join(EXTRACTORS)}, or module:function")
+    arg_parser.add_argument('--html-only', action='store_true', help="a module:function extractor takes only the HTML")
+    arg_parser.add_argument('--match', help="regex of URLs to replay")
+    arg_parser.add_argument('--all-versions', action='store_true', help="replay every archived version of a URL")
+    arg_parser.add_argument('--workers', type=int)
+    arg_parser.add_argument('--output', help="write {url, result, error} records here (.json or .jsonl)")
+    arg_parser.add_argument('--reindex', action='store_true', help="rebuild the index from the segments")
+    args = arg_parser.parse_args()
+    archive = PageArchive(args.directory)
+    if args.reindex:
+        archive.reindex()
+    print(f"Archive: {archive.stats()}")
+    if not args.extractor:
+        archive.close()
+        return
+    extractor = _extractor_spec(args.extractor, not args.html_only)
+    writer = open_writer(args.output) if args.output else None
+    start = time.perf_counter()
+    count = failed = 0
+    for url, result, error in replay(archive, extractor, args.match, args.workers, not args.all_versions):
+        count += 1
+        failed += error is not None
+        if writer:
+            writer.write({'url': url, 'result': result, 'error': error})
+    elapsed = time.perf_counter() - start
+    if writer:
+        writer.close()
+    archive.close()
+    print(f"Replayed {count} pages in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} pages/s), "
+          f"{failed} failed")
+
+
+if __name__ == "__main__":
+    main()
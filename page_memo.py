@@ -0,0 +1,186 @@
+import functools
+import hashlib
+import items
+import json
+import metrics
+import os
+import re
+import sqlite3
+import sys
+import sysconfig
+import threading
+import types
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+MEMO_FILE = os.environ.get('PARSE_MEMO_FILE', 'parse_memo.sqlite')
+
+
+def fingerprint(body):
+    """Short content hash of a page body (xxh3 when installed, otherwise blake2b)."""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(body)
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def extractor_key(func, *args):
+    """Name an extractor by its qualified name, a digest of its code and the arguments it gets after the page.
+
+    The digest follows the globals the code names into this project's
+    modules: the functions it calls, the record classes it builds and the
+    selectors it uses. Editing any of them, or calling the extractor with
+    another base URL or backend, invalidates its memo.
+    """
+    digest = hashlib.blake2b(_code_digest(func), digest_size=8)
+    digest.update(repr(args).encode('utf-8'))
+    return f'{func.__module__}.{func.__qualname__}:{digest.hexdigest()}'
+
+
+@functools.lru_cache(maxsize=None)
+def _code_digest(func):
+    # Walking the code takes longer than a memo lookup, so it is done once per function and process.
+    digest = hashlib.blake2b(digest_size=16)
+    _digest_code(func.__code__, func.__globals__, digest, set())
+    return digest.digest()
+
+
+# Library code is left out of extractor digests: it changes with upgrades, not edits.
+_LIBRARY_PATHS = tuple({sysconfig.get_paths()[name] for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')})
+_PLAIN = (str, bytes, int, float, complex, bool, type(None))
+
+
+def _in_project(value):
+    module = sys.modules.get(getattr(value, '__module__', None) or '')
+    path = getattr(module, '__file__', None)
+    return path is not None and not path.startswith(_LIBRARY_PATHS)
+
+
+def _digest_code(code, namespace, digest, seen):
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _digest_code(const, namespace, digest, seen)
+        else:
+            digest.update(repr(const).encode('utf-8'))
+    for name in code.co_names:
+        if name in namespace and not _is_state(name, namespace[name]):
+            _digest_value(namespace[name], digest, seen)
+
+
+def _is_state(name, value):
+    # Private containers (_BACKENDS, _prefixes, ...) are caches filled at run time, not configuration.
+    return name.startswith('_') and isinstance(value, (list, dict, set))
+
+
+def _digest_value(value, digest, seen):
+    if isinstance(value, _PLAIN):
+        digest.update(repr(value).encode('utf-8'))
+        return
+    if isinstance(value, (tuple, list)):
+        digest.update(b'[')
+        for item in value:
+            _digest_value(item, digest, seen)
+        digest.update(b']')
+        return
+    if isinstance(value, (set, frozenset)):
+        # Set order changes with the hash seed, so go by the sorted member reprs.
+        digest.update(repr(sorted(map(repr, value))).encode('utf-8'))
+        return
+    if isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value, key=repr):
+            _digest_value(key, digest, seen)
+            _digest_value(value[key], digest, seen)
+        digest.update(b'}')
+        return
+    if isinstance(value, re.Pattern):
+        digest.update(repr(value.pattern).encode('utf-8'))
+        return
+    if id(value) in seen or not _in_project(value):
+        return
+    seen.add(id(value))
+    if isinstance(value, (staticmethod, classmethod)):
+        value = value.__func__
+    if isinstance(value, types.FunctionType):
+        _digest_code(value.__code__, value.__globals__, digest, seen)
+    elif isinstance(value, type):
+        for cls in value.__mro__[:-1]:
+            for name, attr in sorted(vars(cls).items()):
+                if name not in ('__dict__', '__weakref__', '__doc__', '__module__') and not _is_state(name, attr):
+                    digest.update(name.encode('utf-8'))
+                    _digest_value(attr, digest, seen)
+    elif hasattr(value, '__dict__'):
+        # Selectors, regions and other configured objects: their settings, not their identity.
+        _digest_value(type(value), digest, seen)
+        for name, attr in sorted(vars(value).items()):
+            digest.update(name.encode('utf-8'))
+            _digest_value(attr, digest, seen)
+
+
+class ParseMemo:
+    """Remembers what each extractor returned for each URL, keyed on the page's content hash."""
+
+    def __init__(self, path=MEMO_FILE):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS memo (
+            extractor TEXT, url TEXT, fingerprint TEXT, records TEXT,
+            PRIMARY KEY (extractor, url))""")
+        self.db.commit()
+        self.skipped = 0
+        self.reparsed = 0
+
+    def lookup(self, extractor, url, digest):
+        """Return (True, records) if `url` was parsed before with the same content, else (False, None)."""
+        with self.lock:
+            row = self.db.execute("SELECT fingerprint, records FROM memo WHERE extractor = ? AND url = ?",
+                                  (extractor, url)).fetchone()
+        if row and row[0] == digest:
+            self.skipped += 1
+            return True, json.loads(row[1], object_hook=items.from_json)
+        return False, None
+
+    def store(self, extractor, url, digest, records):
+        self.reparsed += 1
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?)",
+                            (extractor, url, digest, json.dumps(records, ensure_ascii=False, default=items.to_json)))
+            self.db.commit()
+
+    def extract(self, func, url, body, *args):
+        """Run func(body, *args) unless this URL's body is unchanged since the last run."""
+        extractor = extractor_key(func, *args)
+        digest = fingerprint(body)
+        found, records = self.lookup(extractor, url, digest)
+        if found:
+            return records
+        with metrics.timer('parse_seconds'):
+            records = func(body, *args)
+        self.store(extractor, url, digest, records)
+        return records
+
+    def stats(self):
+        return {'reparsed': self.reparsed, 'skipped': self.skipped}
+
+    def close(self):
+        self.db.close()
+
+
+_memo = None
+_memo_pid = None
+
+
+def default_memo():
+    """The process-wide memo; worker processes each open their own connection."""
+    global _memo, _memo_pid
+    if _memo is None or _memo_pid != os.getpid():
+        _memo = ParseMemo()
+        _memo_pid = os.getpid()
+    return _memo
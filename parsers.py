@@ -0,0 +1,237 @@
+import os
+import re
+from bs4 import BeautifulSoup
+
+try:
+    import soupsieve
+except ImportError:
+    soupsieve = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+# Backend used when an extractor is not told otherwise; 'auto' picks the fastest installed.
+DEFAULT_BACKEND = os.environ.get('PARSER_BACKEND', 'auto')
+# Parse only the region of the page an extractor reads, when it names one (PARSER_PARTIAL=0 turns this off).
+PARTIAL = os.environ.get('PARSER_PARTIAL', '1') != '0'
+
+
+def _cls(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class Selector:
+    """A CSS selector with its hand-written XPath equivalent for lxml."""
+
+    def __init__(self, css, xpath):
+        self.css = css
+        self.xpath = xpath
+
+    def __repr__(self):
+        return f'Selector({self.css!r})'
+
+
+class Region:
+    """A <tag class="...cls..."> element of a page and everything inside it.
+
+    Extractors that only read part of a page name it, so backends parse just
+    that element's markup instead of the whole document. (A bs4 SoupStrainer
+    still tokenizes every byte of the page, so slicing the markup out first is
+    several times faster for all three backends.) Pages without the element
+    are parsed whole.
+    """
+
+    def __init__(self, tag, cls=None):
+        self.tag = tag
+        self.cls = cls
+        attrs = rf'[^>]*\bclass=["\'](?:[^"\']*\s)?{re.escape(cls)}(?=[\s"\'])' if cls else ''
+        self.start = re.compile(rf'<{tag}\b{attrs}', re.IGNORECASE)
+        self.tags = re.compile(rf'<(/?){tag}\b', re.IGNORECASE)
+
+    def __repr__(self):
+        return f'Region({self.tag!r}, {self.cls!r})'
+
+    def find(self, html):
+        """(start, end) offsets of the element's markup, or None if the page does not have it."""
+        match = self.start.search(html)
+        if match is None:
+            return None
+        depth = 0
+        for tag in self.tags.finditer(html, match.start()):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                end = html.find('>', tag.end())
+                return match.start(), len(html) if end == -1 else end + 1
+        return match.start(), len(html)
+
+
+LISTING = Region('section')  # product grid and pager of a catalogue page
+PAGER = Region('ul', 'pager')  # "Page N of M" and the previous/next links
+PRODUCT = Region('article', 'product_page')  # everything the detail extractor reads
+
+
+def _text(html):
+    return html.decode('utf-8', errors='replace') if isinstance(html, bytes) else html
+
+
+def _region_markup(html, region):
+    """The part of `html` to parse: the region's markup, or all of it."""
+    if region is None or not PARTIAL:
+        return html
+    bounds = region.find(_text(html))
+    return html if bounds is None else _text(html)[bounds[0]:bounds[1]]
+
+
+PRODUCT_POD = Selector('article.product_pod', f".//article[{_cls('product_pod')}]")
+TITLE_LINK = Selector('h3 a', './/h3//a')
+PRICE = Selector('p.price_color', f".//p[{_cls('price_color')}]")
+PAGER_CURRENT = Selector('li.current', f".//li[{_cls('current')}]")
+NEXT_LINK = Selector('li.next a', f".//li[{_cls('next')}]//a")
+CONTAINER = Selector('div.container-fluid', f".//div[{_cls('container-fluid')}]")
+PRODUCT_PRICE = Selector('div.product_price p.price_color',
+                         f".//div[{_cls('product_price')}]//p[{_cls('price_color')}]")
+AVAILABILITY = Selector('div.product_price p.price_color ~ p.instock.availability',
+                        f".//div[{_cls('product_price')}]//p[{_cls('price_color')}]"
+                        f"/following-sibling::p[{_cls('instock')} and {_cls('availability')}]")
+STAR_RATING = Selector('p.star-rating', f".//p[{_cls('star-rating')}]")
+DESCRIPTION = Selector('#product_description ~ p',
+                       ".//*[@id='product_description']/following-sibling::p")
+INFO_TABLE = Selector('table.table-striped', f".//table[{_cls('table-striped')}]")
+ROW = Selector('tr', './/tr')
+HEADER_CELL = Selector('th', './/th')
+DATA_CELL = Selector('td', './/td')
+QUOTE = Selector('div.quote', f".//div[{_cls('quote')}]")
+QUOTE_TEXT = Selector('span.text', f".//span[{_cls('text')}]")
+AUTHOR = Selector('small.author', f".//small[{_cls('author')}]")
+TAG = Selector('div.tags a.tag', f".//div[{_cls('tags')}]//a[{_cls('tag')}]")
+
+
+class Bs4Backend:
+    name = 'bs4'
+
+    def __init__(self, features='html.parser'):
+        self.features = features
+        self.compiled = {}
+
+    def _compile(self, selector):
+        compiled = self.compiled.get(selector)
+        if compiled is None:
+            compiled = soupsieve.compile(selector.css) if soupsieve else selector.css
+            self.compiled[selector] = compiled
+        return compiled
+
+    def parse(self, html, region=None):
+        return BeautifulSoup(_region_markup(html, region), self.features)
+
+    def select(self, node, selector):
+        compiled = self._compile(selector)
+        if soupsieve:
+            return compiled.select(node)
+        return node.select(compiled)
+
+    def select_one(self, node, selector):
+        compiled = self._compile(selector)
+        if soupsieve:
+            return compiled.select_one(node)
+        return node.select_one(compiled)
+
+    def text(self, node):
+        return node.text
+
+    def attr(self, node, name):
+        value = node.get(name)
+        if isinstance(value, list):
+            return ' '.join(value)
+        return value
+
+
+class LxmlBackend:
+    name = 'lxml'
+
+    def __init__(self):
+        self.compiled = {}
+
+    def _compile(self, selector):
+        compiled = self.compiled.get(selector)
+        if compiled is None:
+            compiled = etree.XPath(selector.xpath)
+            self.compiled[selector] = compiled
+        return compiled
+
+    def parse(self, html, region=None):
+        return lxml.html.document_fromstring(_region_markup(html, region))
+
+    def select(self, node, selector):
+        return self._compile(selector)(node)
+
+    def select_one(self, node, selector):
+        found = self._compile(selector)(node)
+        return found[0] if found else None
+
+    def text(self, node):
+        return str(node.text_content())
+
+    def attr(self, node, name):
+        return node.get(name)
+
+
+class SelectolaxBackend:
+    name = 'selectolax'
+
+    def parse(self, html, region=None):
+        return HTMLParser(_region_markup(html, region))
+
+    def select(self, node, selector):
+        return node.css(selector.css)
+
+    def select_one(self, node, selector):
+        return node.css_first(selector.css)
+
+    def text(self, node):
+        return node.text()
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+
+_BACKENDS = {}
+
+
+def available_backends():
+    names = ['bs4']
+    if lxml is not None:
+        names.append('lxml')
+    if HTMLParser is not None:
+        names.append('selectolax')
+    return names
+
+
+def get_backend(name=None):
+    """Return a shared parser backend by name ('bs4', 'lxml', 'selectolax' or 'auto')."""
+    name = name or DEFAULT_BACKEND
+    if name == 'auto':
+        name = available_backends()[-1]
+    backend = _BACKENDS.get(name)
+    if backend is None:
+        if name == 'bs4':
+            backend = Bs4Backend()
+        elif name == 'lxml' and lxml is not None:
+            backend = LxmlBackend()
+        elif name == 'selectolax' and HTMLParser is not None:
+            backend = SelectolaxBackend()
+        else:
+            raise ValueError(f"Parser backend {name!r} is not available "
+                             f"(installed: {', '.join(available_backends())})")
+        _BACKENDS[name] = backend
+    return backend
@@ -1,43 +1,107 @@
-import requests
-from concurrent.futures import ThreadPoolExecutor
+import http_cache
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from multiprocessing import Pool
 import time
+from parsers import get_backend, QUOTE, QUOTE_TEXT, AUTHOR, TAG
+from sessions import connection_stats
 
 BASE_URL = 'http://quotes.toscrape.com/page/{}/'
 PAGES = list(range(1, 11))
+PARSE_BATCH = 4  # pages sent to a parser process per task
 
+_parse_pool = None
 
-def fetch_page(page):
-    url = BASE_URL.format(page)
-    response = requests.get(url)
+
+def fetch_page(page, base_url=None):
+    url = (base_url or BASE_URL).format(page)
+    response = http_cache.get(url)
     return response.text
 
 
+def fetch_bytes(page, base_url=None):
+    return http_cache.get((base_url or BASE_URL).format(page)).content
+
+
+def parse_quotes(html, parser=None):
+    """Return (text, author, tags) for every quote on a page."""
+    parser = parser or get_backend()
+    doc = parser.parse(html)
+    quotes = []
+    for quote in parser.select(doc, QUOTE):
+        text = parser.text(parser.select_one(quote, QUOTE_TEXT))
+        author = parser.text(parser.select_one(quote, AUTHOR))
+        tags = tuple(parser.text(tag) for tag in parser.select(quote, TAG))
+        quotes.append((text, author, tags))
+    return quotes
+
+
+def scrape_page(page):
+    return parse_quotes(fetch_page(page))
+
+
+def parse_batch(bodies):
+    """Parse several raw page bodies in one task, so a worker pays one round of pickling per batch."""
+    parser = get_backend()
+    return [parse_quotes(body, parser) for body in bodies]
+
+
+def get_parse_pool():
+    """Parser processes started once and reused for every hybrid run."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(os.cpu_count())
+    return _parse_pool
+
+
 def sequential_scrape():
     start = time.time()
-    for page in PAGES:
-        fetch_page(page)
+    quotes = [scrape_page(page) for page in PAGES]
     end = time.time()
     total = end - start
-    print(f"Sequential: Total time: {total:.2f}s, Avg per page: {total/len(PAGES):.2f}s")
+    print(f"Sequential: Total time: {total:.2f}s, Avg per page: {total/len(PAGES):.2f}s, Quotes: {sum(map(len, quotes))}")
+    return quotes
 
 
 def threaded_scrape():
     start = time.time()
     with ThreadPoolExecutor(max_workers=5) as executor:
-        list(executor.map(fetch_page, PAGES))
+        quotes = list(executor.map(scrape_page, PAGES))
     end = time.time()
     total = end - start
-    print(f"Threaded: Total time: {total:.2f}s, Avg per page: {total/len(PAGES):.2f}s")
+    print(f"Threaded: Total time: {total:.2f}s, Avg per page: {total/len(PAGES):.2f}s, Quotes: {sum(map(len, quotes))}")
+    return quotes
 
 
 def multiprocessing_scrape():
     start = time.time()
     with Pool(processes=5) as pool:
-        pool.map(fetch_page, PAGES)
+        quotes = pool.map(scrape_page, PAGES)
+    end = time.time()
+    total = end - start
+    print(f"Multiprocessing: Total time: {total:.2f}s, Avg per page: {total/len(PAGES):.2f}s, Quotes: {sum(map(len, quotes))}")
+    return quotes
+
+
+def hybrid_scrape():
+    """Fetch on threads, parse raw bytes in batches on the long-lived process pool."""
+    pool = get_parse_pool()
+    start = time.time()
+    batches = []
+    batch = []
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        for body in executor.map(fetch_bytes, PAGES):
+            batch.append(body)
+            if len(batch) == PARSE_BATCH:
+                batches.append(pool.submit(parse_batch, batch))
+                batch = []
+    if batch:
+        batches.append(pool.submit(parse_batch, batch))
+    quotes = [page for future in batches for page in future.result()]
     end = time.time()
     total = end - start
-    print(f"Multiprocessing: Total time: {total:.2f}s, Avg per page: {total/len(PAGES):.2f}s")
+    print(f"Hybrid: Total time: {total:.2f}s, Avg per page: {total/len(PAGES):.2f}s, Quotes: {sum(map(len, quotes))}")
+    return quotes
 
 
 def main():
@@ -45,6 +109,9 @@ def main():
     sequential_scrape()
     threaded_scrape()
     multiprocessing_scrape()
+    hybrid_scrape()
+    print(f"Connections (this process): {connection_stats()}")
+    print(f"HTTP cache (this process): {http_cache.default_cache().stats()}")
 
 
 if __name__ == "__main__":
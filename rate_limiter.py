@@ -0,0 +1,177 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+
+class _Bucket:
+    """Token accounting shared by the async and the threaded bucket."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.started = None
+        self.last = None
+        self.acquired = 0
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _delay(self):
+        """Seconds to wait before a token is available."""
+        if self.started is None:
+            self.started = time.monotonic()
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        delay = (1 - self.tokens) / self.rate
+        self.waited += delay
+        return delay
+
+    def _take(self):
+        self._refill()
+        self.tokens -= 1
+        self.acquired += 1
+        self.last = time.monotonic()
+
+    def observed_rate(self):
+        if self.started is None:
+            return 0.0
+        elapsed = self.last - self.started
+        if elapsed <= 0:
+            return float(self.acquired)
+        return (self.acquired - 1) / elapsed
+
+    def stats(self):
+        return {
+            'target_rate': self.rate,
+            'observed_rate': round(self.observed_rate(), 3),
+            'capacity': self.capacity,
+            'acquired': self.acquired,
+            'waited_seconds': round(self.waited, 3),
+        }
+
+
+class TokenBucket(_Bucket):
+    """Async token bucket: `rate` tokens per second, up to `capacity` in a burst."""
+
+    def __init__(self, rate, capacity=None):
+        super().__init__(rate, capacity)
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # The lock keeps waiters in FIFO order so nobody is starved by a burst.
+        async with self.lock:
+            delay = self._delay()
+            if delay:
+                await asyncio.sleep(delay)
+            self._take()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class ThreadTokenBucket(_Bucket):
+    """Blocking token bucket that can be shared by worker threads."""
+
+    def __init__(self, rate, capacity=None):
+        super().__init__(rate, capacity)
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            delay = self._delay()
+            if delay:
+                time.sleep(delay)
+            self._take()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class SharedTokenBucket:
+    """Async token bucket kept in SQLite, so every process using the file shares one `rate`.
+
+    Each acquire reserves the next free slot in a single short transaction,
+    letting the balance go negative, and then sleeps until that slot comes
+    round. Waiters therefore never poll the database, and the combined rate
+    holds however many processes take part. Times are wall-clock, so hosts
+    sharing the file need synchronised clocks.
+    """
+
+    def __init__(self, path, rate, capacity=None, name='default'):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.name = name
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        self.db.execute("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)", (name, self.capacity, time.time()))
+        self.lock = threading.Lock()
+        self.started = None
+        self.last = None
+        self.acquired = 0
+        self.waited = 0.0
+
+    def _reserve(self):
+        """Take a token, returning the seconds until it may be used."""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated = self.db.execute("SELECT tokens, updated FROM buckets WHERE name = ?",
+                                                  (self.name,)).fetchone()
+                now = time.time()
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate) - 1
+                self.db.execute("UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?",
+                                (tokens, now, self.name))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return max(0.0, -tokens / self.rate)
+
+    async def acquire(self):
+        if self.started is None:
+            self.started = time.monotonic()
+        # The transaction may wait on another process's lock; keep that off the event loop.
+        delay = await asyncio.to_thread(self._reserve)
+        if delay:
+            self.waited += delay
+            await asyncio.sleep(delay)
+        self.acquired += 1
+        self.last = time.monotonic()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    observed_rate = _Bucket.observed_rate
+
+    def stats(self):
+        """Counts for this process; `target_rate` is shared with the others."""
+        return {
+            'target_rate': self.rate,
+            'observed_rate': round(self.observed_rate(), 3),
+            'capacity': self.capacity,
+            'acquired': self.acquired,
+            'waited_seconds': round(self.waited, 3),
+        }
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,193 @@
+import numpy as np
+
+# String fields are stored as integer codes into a per-column label list
+# ("categorical" columns), which keeps rows small and makes group-by a bincount.
+CAR_DTYPE = np.dtype([('brand', np.int32), ('model', np.int32), ('year', np.int16), ('mileage', np.int64)])
+CAR_CATEGORIES = ('brand', 'model')
+SCORE_DTYPE = np.dtype([('student', np.int32), ('score', np.int32)])  # one row per student per score
+SCORE_CATEGORIES = ('student',)
+
+AGGREGATES = ('sum', 'mean', 'count', 'min', 'max')
+
+
+def factorize(values):
+    """(codes, uniques) with uniques in order of first appearance, like iterating a dict."""
+    uniques, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.ravel()], uniques[order]
+
+
+class RecordStore:
+    """Growable NumPy structured array of fixed-width records.
+
+    Appends go into spare capacity that doubles when full, so building a store
+    row by row stays amortised O(1); every query runs on whole columns.
+    Labels of categorical columns get codes in order of first appearance.
+    """
+
+    def __init__(self, dtype, categories=(), capacity=1024):
+        self.dtype = np.dtype(dtype)
+        self._rows = np.zeros(capacity, dtype=self.dtype)
+        self.size = 0
+        self.labels = {name: [] for name in categories}
+        self._codes = {name: {} for name in categories}
+
+    @classmethod
+    def from_records(cls, records, dtype, categories=()):
+        """Build from an iterable of dicts keyed by field name."""
+        store = cls(dtype, categories)
+        names = store.dtype.names
+        encode = [store._encoder(name) for name in names]
+        store.extend(np.array([tuple(convert(record[name]) for name, convert in zip(names, encode))
+                               for record in records], dtype=store.dtype))
+        return store
+
+    def _encoder(self, name):
+        if name not in self._codes:
+            return lambda value: value
+        codes, labels = self._codes[name], self.labels[name]
+
+        def encode(label):
+            code = codes.get(label)
+            if code is None:
+                code = codes[label] = len(labels)
+                labels.append(label)
+            return code
+        return encode
+
+    def encode(self, name, labels):
+        """Codes for `labels` in categorical column `name`, adding new labels as needed."""
+        encode = self._encoder(name)
+        return np.array([encode(label) for label in labels], dtype=self.dtype[name])
+
+    def decode(self, name, codes):
+        return np.array(self.labels[name], dtype=object)[codes]
+
+    @property
+    def data(self):
+        """View of the filled rows; writes to it change the store."""
+        return self._rows[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        if needed > len(self._rows):
+            grown = np.zeros(max(needed, 2 * len(self._rows)), dtype=self.dtype)
+            grown[:self.size] = self.data
+            self._rows = grown
+
+    def append(self, record):
+        self._reserve(1)
+        self._rows[self.size] = tuple(self._encoder(name)(record[name]) for name in self.dtype.names)
+        self.size += 1
+
+    def extend(self, rows):
+        """Append already-encoded rows (a structured array) in one copy."""
+        rows = np.asarray(rows, dtype=self.dtype)
+        self._reserve(len(rows))
+        self._rows[self.size:self.size + len(rows)] = rows
+        self.size += len(rows)
+
+    def add(self, column, indices, amounts):
+        """Batched in-place update: column[indices] += amounts, repeated indices included."""
+        values = self.data[column]
+        indices = np.asarray(indices)
+        amounts = np.broadcast_to(amounts, indices.shape)
+        # np.add.at is slow on a strided field view; summing per row with
+        # bincount and adding once is ~10x faster (exact for integers below 2**53).
+        values += np.bincount(indices, weights=amounts, minlength=len(values)).astype(values.dtype)
+
+    def records(self, rows=None):
+        """Rows as dicts with labels decoded, e.g. for the output of top_k or above_mean."""
+        rows = self.data if rows is None else rows
+        columns = {name: self.decode(name, rows[name]) if name in self.labels else rows[name].tolist()
+                   for name in self.dtype.names}
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def summary(self, column):
+        values = self.data[column]
+        return {
+            'total': values.sum(),
+            'max': values.max(),
+            'min': values.min(),
+            'mean': values.mean(),
+        }
+
+    def group_by(self, key, column=None, how='sum'):
+        """(groups, aggregated values) with groups in order of first appearance."""
+        if how not in AGGREGATES:
+            raise ValueError(f"how must be one of {AGGREGATES}, not {how!r}")
+        if key in self.labels:
+            codes = self.data[key]
+            counts = np.bincount(codes, minlength=len(self.labels[key]))
+            present = np.flatnonzero(counts)
+            groups = self.decode(key, present)
+        else:
+            codes, groups = factorize(self.data[key])
+            counts = np.bincount(codes, minlength=len(groups))
+            present = slice(None)
+        if how == 'count':
+            return groups, counts[present]
+        values = self.data[column]
+        if how in ('sum', 'mean'):
+            totals = np.bincount(codes, weights=values, minlength=len(counts))[present]
+            if how == 'mean':
+                return groups, totals / counts[present]
+            return groups, totals.astype(values.dtype) if values.dtype.kind in 'iu' else totals
+        # min/max: sort by group once, then reduce each contiguous run.
+        order = np.argsort(codes, kind='stable')
+        nonempty = counts[counts > 0]
+        starts = np.concatenate(([0], np.cumsum(nonempty)[:-1]))
+        reduce = np.minimum if how == 'min' else np.maximum
+        return groups, reduce.reduceat(values[order], starts)
+
+    def top_k(self, column, k):
+        """The k rows with the largest `column`, largest first (ties keep insertion order)."""
+        values = self.data[column]
+        k = min(k, len(values))
+        if k == 0:
+            return self.data[:0]
+        candidates = np.argpartition(-values, k - 1)[:k]
+        order = np.lexsort((candidates, -values[candidates]))
+        return self.data[candidates[order]]
+
+    def above_mean(self, column):
+        """Rows whose `column` is strictly above the column mean."""
+        values = self.data[column]
+        return self.data[values > values.mean()]
+
+
+def car_store(cars):
+    """Store of week1-style car dicts (brand, model, year, mileage)."""
+    return RecordStore.from_records(cars, CAR_DTYPE, CAR_CATEGORIES)
+
+
+def student_scores(studentdata):
+    """Long-format store of {name: [scores]}, one row per score."""
+    store = RecordStore(SCORE_DTYPE, SCORE_CATEGORIES, capacity=1)
+    rows = np.empty(sum(len(scores) for scores in studentdata.values()), dtype=SCORE_DTYPE)
+    codes = store.encode('student', studentdata.keys())
+    rows['student'] = np.repeat(codes, [len(scores) for scores in studentdata.values()])
+    rows['score'] = [score for scores in studentdata.values() for score in scores]
+    store.extend(rows)
+    return store
+
+
+def student_report(store):
+    """Same answers as week1.students(): (highest scorer, average total, names above average)."""
+    # Every named student counts towards the average, even one with no scores.
+    names = store.decode('student', np.arange(len(store.labels['student'])))
+    totals = np.bincount(store['student'], weights=store['score'], minlength=len(names)).astype(np.int64)
+    if len(names) == 0:
+        return "", 0.0, []
+    best = int(np.argmax(totals))  # first of any tie, like the strict '>' in the loop
+    highest = names[best] if totals[best] > 0 else ""
+    average = totals.sum() / len(names)
+    return highest, float(average), names[totals > average].tolist()
@@ -0,0 +1,114 @@
+import asyncio
+import random
+from collections import deque
+
+ATTEMPTS = 4  # tries per URL, the first one included
+BASE_DELAY = 0.5  # upper bound of the first retry's backoff, doubling after each retry
+MAX_DELAY = 30.0
+HEDGE_PERCENTILE = 95  # a request slower than this share of recent ones gets a duplicate
+HEDGE_BUDGET = 0.1  # duplicates allowed per request, so a slow server is not hit twice as hard
+MIN_SAMPLES = 20  # responses seen before hedging starts
+WINDOW = 500  # recent response times the percentile is taken over
+
+
+class FetchError(Exception):
+    """A URL that still failed once the whole retry budget was spent."""
+
+    def __init__(self, url, attempts, reason):
+        super().__init__(f"{url} failed after {attempts} attempts: {reason}")
+        self.url = url
+        self.attempts = attempts
+        self.reason = reason
+
+
+class RetryPolicy:
+    """Retry budget, jittered backoff and hedging shared by the fetches of one crawl.
+
+    Backoff is "full jitter": a retry waits a uniform time between 0 and
+    base_delay * 2 ** retry (capped), so clients that failed together do not
+    come back together, and never less than the server's Retry-After. A
+    request still out, counted from when it was sent, at the HEDGE_PERCENTILE
+    of recent response times is sent again and the first copy to answer wins.
+    """
+
+    def __init__(self, attempts=ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY, hedge=True,
+                 hedge_percentile=HEDGE_PERCENTILE, hedge_budget=HEDGE_BUDGET, seed=None):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.rng = random.Random(seed)
+        self.latencies = deque(maxlen=WINDOW)
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def backoff(self, retry, retry_after=None):
+        """Seconds to wait before retry number `retry` (0 for the first)."""
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        return max(delay, retry_after or 0.0)
+
+    def observe(self, seconds):
+        self.latencies.append(seconds)
+
+    def hedge_delay(self):
+        """Seconds to wait for a response before sending a duplicate, None when no duplicate may be sent."""
+        if not self.hedge or len(self.latencies) < MIN_SAMPLES:
+            return None
+        if self.hedges >= self.hedge_budget * self.requests:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, len(ordered) * self.hedge_percentile // 100)]
+
+    async def hedged(self, request):
+        """Await request(sent), starting a second copy if the first is still out hedge_delay() after it was sent.
+
+        request sets the asyncio.Event it is given once the request actually
+        goes out, past any concurrency or rate limit, so time spent queueing
+        for those does not count as slowness. Returns the first copy to
+        succeed and cancels the other; raises only when every copy sent has
+        failed.
+        """
+        self.requests += 1
+        delay = self.hedge_delay()
+        sent = asyncio.Event()
+        first = asyncio.ensure_future(request(sent))
+        if delay is None:
+            return await first
+        waiting = asyncio.ensure_future(sent.wait())
+        pending = {first}
+        try:
+            await asyncio.wait({first, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            if not first.done():
+                await asyncio.wait({first}, timeout=delay)
+            if first.done():
+                return first.result()
+            self.hedges += 1
+            second = asyncio.ensure_future(request(asyncio.Event()))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+            raise error
+        finally:
+            waiting.cancel()
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'failed_urls': self.failures,
+        }
@@ -0,0 +1,125 @@
+import asyncio
+import signal
+
+_DONE = object()
+
+
+class WorkerPool:
+    """A fixed set of consumer tasks fed from a lazy iterable through a bounded queue.
+
+    Only queue_size items wait in the queue and at most `workers` are in
+    hand, so memory stays flat however many items the iterable yields. The
+    feeder blocks while the queue is full, which is the backpressure.
+    drain() stops the feeding, drops what is still queued and lets the items
+    in hand finish. A handler that raises cancels the rest of the pool and
+    the error comes out of run(). With drain_on_interrupt the first Ctrl-C
+    during run() drains and a second one interrupts as usual (not on
+    Windows, whose loops take no signal handlers).
+    """
+
+    def __init__(self, handle, workers, queue_size=None, drain_on_interrupt=False):
+        self.handle = handle
+        self.workers = workers
+        self.queue_size = queue_size or workers
+        self.drain_on_interrupt = drain_on_interrupt
+        self.draining = False
+        self.fed = 0
+        self.handled = 0
+
+    def drain(self):
+        self.draining = True
+
+    async def _feed(self, items, queue):
+        for item in items:
+            if self.draining:
+                break
+            await queue.put(item)
+            self.fed += 1
+        for _ in range(self.workers):
+            await queue.put(_DONE)
+
+    async def _consume(self, queue):
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if self.draining:
+                continue
+            await self.handle(item)
+            self.handled += 1
+
+    async def run(self, items):
+        """Handle every item of `items` (until drain()); returns the number handled."""
+        loop = asyncio.get_running_loop()
+        handling_interrupt = False
+        if self.drain_on_interrupt:
+            try:
+                loop.add_signal_handler(signal.SIGINT, self._interrupted)
+                handling_interrupt = True
+            except (NotImplementedError, RuntimeError):
+                pass
+        queue = asyncio.Queue(self.queue_size)
+        tasks = [asyncio.create_task(self._feed(items, queue))]
+        tasks += [asyncio.create_task(self._consume(queue)) for _ in range(self.workers)]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # Also reached when run() itself is cancelled.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if handling_interrupt:
+                loop.remove_signal_handler(signal.SIGINT)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return self.handled
+
+    def _interrupted(self):
+        print("Interrupted, finishing the items in hand (Ctrl-C again to stop now)")
+        self.drain()
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGINT)
+
+    def stats(self):
+        return {'workers': self.workers, 'queue_size': self.queue_size, 'fed': self.fed,
+                'handled': self.handled, 'drained': self.draining}
+
+
+class ReorderBuffer:
+    """Hands back numbered items in index order, whatever order they finish in.
+
+    Producers await wait_turn(index) before starting an item, which lets
+    them through only while the item is within `window` of the next one
+    due. A slow item then holds back those after it instead of the buffer
+    growing without bound, and at most `window` items are ever held.
+    """
+
+    def __init__(self, window, start=0):
+        self.window = window
+        self.next = start
+        self.held = {}
+        self.peak_held = 0
+        self.condition = asyncio.Condition()
+
+    async def wait_turn(self, index):
+        async with self.condition:
+            await self.condition.wait_for(lambda: index < self.next + self.window)
+
+    async def put(self, index, item):
+        """Add item number `index`; returns the items now due, in order."""
+        self.held[index] = item
+        self.peak_held = max(self.peak_held, len(self.held))
+        due = []
+        while self.next in self.held:
+            due.append(self.held.pop(self.next))
+            self.next += 1
+        if due:
+            async with self.condition:
+                self.condition.notify_all()
+        return due
+
+    def rest(self):
+        """What is still held, in index order, skipping indexes that never arrived (items dropped by a drain)."""
+        rest = [self.held[index] for index in sorted(self.held)]
+        self.held.clear()
+        return rest
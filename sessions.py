@@ -0,0 +1,170 @@
+import os
+import ssl
+import threading
+import weakref
+import requests
+import metrics
+
+POOL_SIZE = 32  # keep-alive connections kept per host
+TIMEOUT = (5, 30)  # seconds to connect, seconds between bytes of the response
+
+
+class ConnectionStats:
+    """Counts of requests sent and connections / TLS handshakes they needed."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'connections': 0, 'tls_handshakes': 0, 'tls_resumed': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def to_dict(self):
+        with self.lock:
+            counts = dict(self.counts)
+        counts['reused'] = counts['requests'] - counts['connections']
+        return counts
+
+
+STATS = ConnectionStats()
+
+
+class ResumingContext(ssl.SSLContext):
+    """Client TLS context shared by the pooled connections that trust the same CAs.
+
+    It loads its CA bundle once instead of once per connection, and offers
+    the server the last TLS session seen for the same host, so a new
+    connection usually gets an abbreviated handshake.
+    """
+
+    def __new__(cls, cafile=None, capath=None, cadata=None):
+        return super().__new__(cls, ssl.PROTOCOL_TLS_CLIENT)
+
+    def __init__(self, cafile=None, capath=None, cadata=None):
+        self.lock = threading.Lock()
+        self.trust = (cafile, capath, cadata)
+        self.sessions = {}
+        self.sockets = {}
+        # The same hardening urllib3 applies to the contexts it builds itself.
+        self.minimum_version = ssl.TLSVersion.TLSv1_2
+        self.options |= ssl.OP_NO_COMPRESSION
+        self.set_alpn_protocols(['http/1.1'])
+        if any(self.trust):
+            super().load_verify_locations(cafile, capath, cadata)
+        else:
+            self.load_default_certs()
+
+    def load_verify_locations(self, cafile=None, capath=None, cadata=None):
+        # urllib3 calls this for every new connection with the bundle the
+        # context was created for; anything else would widen what all its
+        # other connections trust.
+        if (cafile, capath, cadata) != self.trust:
+            raise ValueError("a shared context only trusts the CA bundle it was created with")
+
+    def _session_for(self, host):
+        with self.lock:
+            # TLS 1.3 tickets arrive after the handshake, so ask the most recent
+            # live connection for its session rather than storing it up front.
+            last = self.sockets.get(host)
+            sock = last() if last is not None else None
+            session = sock.session if sock is not None else None
+            if session is not None:
+                self.sessions[host] = session
+            return self.sessions.get(host)
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None and server_hostname is not None:
+            session = self._session_for(server_hostname)
+        tls = super().wrap_socket(sock, *args, server_hostname=server_hostname, session=session, **kwargs)
+        if server_hostname is not None:
+            with self.lock:
+                self.sockets[server_hostname] = weakref.ref(tls)
+        return tls
+
+
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+
+def tls_context(cafile=None, capath=None, cadata=None):
+    """The shared context for one CA bundle (None for the system default certificates)."""
+    key = (cafile, capath, cadata)
+    with _contexts_lock:
+        context = _contexts.get(key)
+        if context is None:
+            context = _contexts[key] = ResumingContext(cafile, capath, cadata)
+        return context
+
+
+class PooledHTTPConnection(metrics.TimedHTTPConnection):
+    def connect(self):
+        super().connect()
+        STATS.count('connections')
+
+
+class PooledHTTPSConnection(metrics.TimedHTTPSConnection):
+    def connect(self):
+        # Only verified connections share the context: verify=False would
+        # have to switch off hostname checking on it for everyone.
+        if self.ssl_context is None and self.cert_reqs in ('CERT_REQUIRED', ssl.CERT_REQUIRED):
+            self.ssl_context = tls_context(self.ca_certs, self.ca_cert_dir, self.ca_cert_data)
+        super().connect()
+        STATS.count('connections')
+        STATS.count('tls_handshakes')
+        if getattr(self.sock, 'session_reused', False):
+            STATS.count('tls_resumed')
+
+
+class PooledHTTPConnectionPool(metrics.TimedHTTPConnectionPool):
+    ConnectionCls = PooledHTTPConnection
+
+
+class PooledHTTPSConnectionPool(metrics.TimedHTTPSConnectionPool):
+    ConnectionCls = PooledHTTPSConnection
+
+
+class PooledAdapter(metrics.InstrumentedAdapter):
+    """Keep-alive adapter with a default timeout that counts connection reuse."""
+
+    pool_classes = {'http': PooledHTTPConnectionPool, 'https': PooledHTTPSConnectionPool}
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=TIMEOUT):
+        self.timeout = timeout
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def send(self, request, timeout=None, **kwargs):
+        STATS.count('requests')
+        return super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+
+def make_session(pool_size=POOL_SIZE, timeout=TIMEOUT):
+    """requests Session whose pool keeps `pool_size` connections per host alive.
+
+    requests already asks for gzip/deflate, and for brotli once the brotli
+    package is installed, so compression needs nothing extra here.
+    """
+    session = requests.Session()
+    adapter = PooledAdapter(pool_size, timeout)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def shared_session():
+    """The process-wide session; threads share it, worker processes each get their own."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = make_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+def connection_stats():
+    return STATS.to_dict()
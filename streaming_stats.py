@@ -0,0 +1,204 @@
+import hashlib
+import math
+import numpy as np
+
+
+class RunningStats:
+    """Count, min, max, sum, mean and variance in one pass and constant memory (Welford).
+
+    Two accumulators built on different shards merge into the stats of the
+    combined data (Chan et al.), so workers can each keep their own.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, like statistics.pvariance."""
+        return self.m2 / self.count if self.count else None
+
+    @property
+    def sample_variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance) if self.count else None
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'sum': self.total,
+            'mean': self.mean if self.count else None,
+            'stdev': self.stdev,
+        }
+
+
+def _key(item):
+    return item if isinstance(item, bytes) else repr(item).encode('utf-8')
+
+
+class CountMinSketch:
+    """Approximate counts of any hashable items in depth x width counters.
+
+    Estimates never undercount; they overcount by at most 2N/width with
+    probability 1 - 2**-depth after N additions. Hashing uses blake2b rather
+    than hash(), so sketches from different processes line up and can merge.
+    """
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.rows = np.arange(depth)
+
+    def _columns(self, item):
+        digest = hashlib.blake2b(_key(item), digest_size=8 * self.depth).digest()
+        return np.frombuffer(digest, dtype=np.uint64) % self.width
+
+    def add(self, item, count=1):
+        self.table[self.rows, self._columns(item)] += count
+
+    def estimate(self, item):
+        return int(self.table[self.rows, self._columns(item)].min())
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("can only merge sketches of the same width and depth")
+        self.table += other.table
+        return self
+
+
+class SpaceSaving:
+    """The (approximately) k most frequent items of a stream, in O(k) memory.
+
+    Any item seen more than N/k times is guaranteed to be tracked; a tracked
+    item's count is high by at most its recorded error.
+    """
+
+    def __init__(self, k=100):
+        self.k = k
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, item, count=1):
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.k:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the least counted item; the newcomer inherits its count as error.
+            evicted = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(evicted)
+            del self.errors[evicted]
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+        return self
+
+    def _floor(self):
+        return min(self.counts.values()) if len(self.counts) >= self.k else 0
+
+    def merge(self, other):
+        """Combine with another summary (Agarwal et al.): an item missing from a
+        full summary may have been counted up to that summary's minimum."""
+        floor, other_floor = self._floor(), other._floor()
+        counts, errors = {}, {}
+        for item in self.counts.keys() | other.counts.keys():
+            counts[item] = self.counts.get(item, floor) + other.counts.get(item, other_floor)
+            errors[item] = self.errors.get(item, floor) + other.errors.get(item, other_floor)
+        kept = sorted(counts, key=counts.get, reverse=True)[:self.k]
+        self.counts = {item: counts[item] for item in kept}
+        self.errors = {item: errors[item] for item in kept}
+        return self
+
+    def top(self, n=10):
+        """[(item, count, error)] for the n most frequent items, most frequent first."""
+        ranked = sorted(self.counts.items(), key=lambda entry: entry[1], reverse=True)[:n]
+        return [(item, count, self.errors[item]) for item, count in ranked]
+
+
+class FieldSummary:
+    """Running stats and most frequent values of one numeric field."""
+
+    def __init__(self, k=20):
+        self.stats = RunningStats()
+        self.frequent = SpaceSaving(k)
+
+    def add(self, value):
+        self.stats.add(value)
+        self.frequent.add(value)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.frequent.merge(other.frequent)
+        return self
+
+    def to_dict(self, top=5):
+        return {**self.stats.to_dict(), 'most_common': [(item, count) for item, count, _ in self.frequent.top(top)]}
+
+
+class RecordSummary:
+    """Distribution of some export.Field columns over a stream of records, without storing them."""
+
+    def __init__(self, fields, k=20):
+        self.fields = fields
+        self.summaries = {field.name: FieldSummary(k) for field in fields}
+
+    def add(self, record):
+        for field in self.fields:
+            value = field.value(record)
+            if value is not None:
+                self.summaries[field.name].add(value)
+
+    def merge(self, other):
+        for name, summary in other.summaries.items():
+            self.summaries[name].merge(summary)
+        return self
+
+    def to_dict(self, top=5):
+        return {name: summary.to_dict(top) for name, summary in self.summaries.items()}
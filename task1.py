@@ -1,8 +1,8 @@
-import requests
+from sessions import shared_session
 
 def fetch_books_to_scrape():
     url = "http://books.toscrape.com/"
-    response = requests.get(url)
+    response = shared_session().get(url)
     
     print(f"Status Code: {response.status_code}")
     print("Response Headers:")
@@ -1,9 +1,9 @@
-import requests
+from sessions import shared_session
 from bs4 import BeautifulSoup
 
 def fetch_books_to_scrape():
     url = "http://books.toscrape.com/"
-    response = requests.get(url)
+    response = shared_session().get(url)
     
     print(f"Status Code: {response.status_code}")
     print("Response Headers:")
@@ -12,7 +12,7 @@ def fetch_books_to_scrape():
 
 def extract_book_titles():
     url = "http://books.toscrape.com/"
-    response = requests.get(url)
+    response = shared_session().get(url)
     soup = BeautifulSoup(response.text, "html.parser")
     
     titles = [book.get_text(strip=True) for book in soup.select("h3 a")]
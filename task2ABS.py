@@ -1,99 +1,239 @@
+import argparse
+import http_cache
+import itertools
+import metrics
 import requests
-from bs4 import BeautifulSoup
-import csv
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urljoin
+from export import export, open_exporter, LISTING_SCHEMA, DETAIL_SCHEMA
+from items import Book
+from page_memo import default_memo
+from parsers import (get_backend, LISTING, PAGER, PRODUCT, CONTAINER, PRODUCT_POD, TITLE_LINK, PRODUCT_PRICE,
+                     AVAILABILITY, STAR_RATING, DESCRIPTION, INFO_TABLE, ROW,
+                     HEADER_CELL, DATA_CELL, PAGER_CURRENT)
+from rate_limiter import ThreadTokenBucket
+from sessions import connection_stats, make_session
+from streaming_stats import RecordSummary
 
-def scrape_books_to_scrape():
-    base_url = 'https://books.toscrape.com/'
+BASE_URL = 'https://books.toscrape.com/'
+WORKERS = 16  # concurrent requests in bulk mode
+RATE_LIMIT = 20  # max requests per second in bulk mode
+IN_FLIGHT = 2 * WORKERS  # detail fetches submitted ahead of the ones being consumed
+
+def fetch_page(url, session=None, limiter=None):
+    if limiter:
+        limiter.acquire()
+    return http_cache.get(url, session=session)
+
+def scrape_books_to_scrape(all_pages=False, session=None, limiter=None, failures=None):
+    """Books of the first listing page, or of every page with all_pages.
+
+    Pages whose fetch raises are skipped and appended to `failures` as (url, error).
+    """
+    base_url = BASE_URL
     
-    response = requests.get(base_url)
+    response = fetch_page(base_url, session, limiter)
     
     if response.status_code != 200:
         print(f"Failed to retrieve the page. Status code: {response.status_code}")
         return None
     
-    soup = BeautifulSoup(response.text, 'html.parser')
+    all_books = default_memo().extract(parse_listing, base_url, response.text, base_url)
     
-    main_container = soup.find('div', class_='container-fluid')
+    if all_pages:
+        total_pages = default_memo().extract(parse_total_pages, base_url, response.text)
+        page_urls = [urljoin(base_url, f'catalogue/page-{i}.html') for i in range(2, total_pages + 1)]
+        def scrape_page(url):
+            try:
+                return scrape_listing_page(url, session, limiter)
+            except requests.RequestException as e:
+                if failures is not None:
+                    failures.append((url, e))
+                return None
+        
+        with ThreadPoolExecutor(WORKERS) as executor:
+            for page_books in executor.map(scrape_page, page_urls):
+                all_books.extend(page_books or [])
     
-    book_articles = main_container.select('article.product_pod')
+    return all_books
+
+def scrape_listing_page(page_url, session=None, limiter=None):
+    response = fetch_page(page_url, session, limiter)
+    
+    if response.status_code != 200:
+        print(f"Failed to retrieve {page_url}. Status code: {response.status_code}")
+        return None
+    
+    return default_memo().extract(parse_listing, page_url, response.text, page_url)
+
+def parse_total_pages(html, parser=None):
+    """Read N from the "Page 1 of N" pager, 1 if there is no pager."""
+    parser = parser or get_backend()
+    pager = parser.select_one(parser.parse(html, PAGER), PAGER_CURRENT)
+    if pager is None:
+        return 1
+    return int(parser.text(pager).split()[-1])
+
+def parse_listing(html, base_url, parser=None):
+    """Extract the product cards from a catalogue listing page."""
+    parser = parser or get_backend()
+    doc = parser.parse(html, LISTING)
+    
+    # A partially parsed page starts inside the container, so search it whole.
+    main_container = parser.select_one(doc, CONTAINER)
+    if main_container is None:
+        main_container = doc
+    
+    book_articles = parser.select(main_container, PRODUCT_POD)
     
     all_books = []
     
     for book in book_articles:
-        book_data = {}
-        
-        title_element = book.h3.a
-        book_data['title'] = title_element.get('title')
+        title_element = parser.select_one(book, TITLE_LINK)
+        title = parser.attr(title_element, 'title')
         
-        relative_url = title_element.get('href')
-        book_data['url'] = urljoin(base_url, relative_url)
+        relative_url = parser.attr(title_element, 'href')
+        url = urljoin(base_url, relative_url)
         
-        price_element = book.select_one('div.product_price p.price_color')
-        book_data['price'] = price_element.text if price_element else 'Not available'
+        price_element = parser.select_one(book, PRODUCT_PRICE)
+        price = parser.text(price_element) if price_element is not None else 'Not available'
         
-        availability_element = price_element.find_next_sibling('p', class_='instock availability')
-        book_data['availability'] = availability_element.text.strip() if availability_element else 'Unknown'
+        availability_element = parser.select_one(book, AVAILABILITY)
+        availability = parser.text(availability_element).strip() if availability_element is not None else 'Unknown'
         
-        rating_element = book.select_one('p.star-rating')
-        if rating_element:
-            rating_classes = rating_element.get('class')
+        rating_element = parser.select_one(book, STAR_RATING)
+        if rating_element is not None:
+            rating_classes = parser.attr(rating_element, 'class').split()
             rating = [cls for cls in rating_classes if cls != 'star-rating'][0]
-            book_data['rating'] = rating
         else:
-            book_data['rating'] = 'No rating'
+            rating = 'No rating'
         
-        all_books.append(book_data)
+        all_books.append(Book(title, url, price, availability, rating))
     
     return all_books
 
-def scrape_book_details(book_url):
+def scrape_book_details(book_url, session=None, limiter=None):
     """Scrape detailed information about a specific book."""
-    response = requests.get(book_url)
+    response = fetch_page(book_url, session, limiter)
     
     if response.status_code != 200:
         print(f"Failed to retrieve the book page. Status code: {response.status_code}")
         return None
     
-    soup = BeautifulSoup(response.text, 'html.parser')
+    return default_memo().extract(parse_book_details, book_url, response.text)
+
+def parse_book_details(html, parser=None):
+    """Extract the description and product information table from a book page."""
+    parser = parser or get_backend()
+    doc = parser.parse(html, PRODUCT)
     
     book_details = {}
     
-    product_description = soup.select_one('#product_description ~ p')
-    book_details['description'] = product_description.text if product_description else 'No description available'
+    product_description = parser.select_one(doc, DESCRIPTION)
+    book_details['description'] = parser.text(product_description) if product_description is not None else 'No description available'
     
-    product_info_table = soup.select_one('table.table-striped')
+    product_info_table = parser.select_one(doc, INFO_TABLE)
     
-    if product_info_table:
-        rows = product_info_table.select('tr')
+    if product_info_table is not None:
+        rows = parser.select(product_info_table, ROW)
         for row in rows:
-            header = row.select_one('th')
-            data = row.select_one('td')
-            if header and data:
-                key = header.text.strip()
-                value = data.text.strip()
+            header = parser.select_one(row, HEADER_CELL)
+            data = parser.select_one(row, DATA_CELL)
+            if header is not None and data is not None:
+                key = parser.text(header).strip()
+                value = parser.text(data).strip()
                 book_details[key] = value
     
     return book_details
 
-def save_to_csv(books_data, filename="books_data.csv"):
-    """Save the extracted data to a CSV file."""
-    if not books_data:
+def completed(executor, func, items, limit=IN_FLIGHT):
+    """Yield (item, future) as each func(item) finishes, submitting lazily with at most `limit` in flight."""
+    items = iter(items)
+    pending = {executor.submit(func, item): item for item in itertools.islice(items, limit)}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            item = pending.pop(future)
+            for next_item in itertools.islice(items, 1):
+                pending[executor.submit(func, next_item)] = next_item
+            yield item, future
+
+def enrich_books(books, session=None, limiter=None, workers=WORKERS, failures=None):
+    """Fetch every book's detail page concurrently, yielding merged records as they finish.
+    
+    A book whose fetch raises is skipped and appended to `failures` as (url, error).
+    """
+    session = session or make_session(workers)
+    limiter = limiter or ThreadTokenBucket(RATE_LIMIT)
+    with ThreadPoolExecutor(workers) as executor:
+        fetch = lambda book: scrape_book_details(book['url'], session, limiter)
+        for book, future in completed(executor, fetch, books, 2 * workers):
+            try:
+                details = future.result()
+            except requests.RequestException as e:
+                if failures is not None:
+                    failures.append((book['url'], e))
+                continue
+            if details:
+                yield {**book, **details}
+
+def save_to_csv(books_data, filename="books_data.csv", schema=LISTING_SCHEMA):
+    """Save the extracted data to a CSV file (or .npz/.parquet) with typed columns."""
+    books_data = iter(books_data)
+    first = next(books_data, None)
+    if first is None:
         print("No data to save.")
         return
     
-    fieldnames = set()
-    for book in books_data:
-        fieldnames.update(book.keys())
-    
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(books_data)
+    export(itertools.chain([first], books_data), filename, schema)
     
     print(f"Data saved to {filename}")
 
+def enrich_all(rate=RATE_LIMIT, workers=WORKERS):
+    start = time.time()
+    session = make_session(workers)
+    limiter = ThreadTokenBucket(rate)
+    page_failures = []
+    books_list = scrape_books_to_scrape(all_pages=True, session=session, limiter=limiter, failures=page_failures)
+    
+    if not books_list:
+        print("Failed to scrape books list.")
+        return
+    
+    print(f"Found {len(books_list)} books in the catalogue.")
+    
+    save_to_csv(books_list, "all_books.csv")
+    
+    summary = RecordSummary([field for field in DETAIL_SCHEMA if field.name in ('price', 'rating', 'stock')])
+    # Enriched records go straight to disk as they arrive instead of piling up in a list.
+    with open_exporter("enhanced_books.csv", DETAIL_SCHEMA) as csv_out, \
+            open_exporter("enhanced_books.npz", DETAIL_SCHEMA) as columns_out:
+        book_failures = []
+        for combined_data in enrich_books(books_list, session, limiter, workers, book_failures):
+            with metrics.timer('serialize_seconds'):
+                csv_out.write(combined_data)
+                columns_out.write(combined_data)
+            summary.add(combined_data)
+            if csv_out.count % 100 == 0:
+                print(f"Enriched {csv_out.count}/{len(books_list)} books")
+    
+    print(f"Enriched {csv_out.count} books in {time.time() - start:.2f} seconds.")
+    for kind, failures in (('listing pages', page_failures), ('books', book_failures)):
+        if failures:
+            print(f"Skipped {len(failures)} {kind} whose fetch failed:")
+            for url, error in failures:
+                print(f"  {url}: {type(error).__name__}")
+    print(f"Rate limiter: {limiter.stats()}")
+    print(f"Parse memo: {default_memo().stats()}")
+    print(f"Connections: {connection_stats()}")
+    print(f"HTTP cache: {http_cache.default_cache().stats()}")
+    for name, distribution in summary.to_dict().items():
+        print(f"{name}: {distribution}")
+    metrics.REGISTRY.write()
+    print("Data saved to enhanced_books.csv and enhanced_books.npz")
+    print("Timings written to metrics.prom and metrics.json")
+
 def main():
     books_list = scrape_books_to_scrape()
     
@@ -132,7 +272,18 @@ def main():
     save_to_csv(books_list, "all_books.csv")
     
     if enhanced_books:
-        save_to_csv(enhanced_books, "enhanced_books.csv")
+        save_to_csv(enhanced_books, "enhanced_books.csv", DETAIL_SCHEMA)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--all', action='store_true',
+                            help="enrich every book in the catalogue concurrently")
+    arg_parser.add_argument('--rate', type=float, default=RATE_LIMIT,
+                            help="max requests per second with --all")
+    arg_parser.add_argument('--workers', type=int, default=WORKERS,
+                            help="concurrent requests with --all")
+    args = arg_parser.parse_args()
+    if args.all:
+        enrich_all(args.rate, args.workers)
+    else:
+        main()
\ No newline at end of file
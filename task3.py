@@ -1,28 +1,130 @@
+import http_cache
+import re
 import requests
-from bs4 import BeautifulSoup
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
+from frontier import CrawlFrontier, FAILED
+from sessions import connection_stats
+from parsers import get_backend, LISTING, PAGER, TITLE_LINK, NEXT_LINK, PAGER_CURRENT
 
 BASE_URL = "http://books.toscrape.com/"
+FRONTIER_FILE = "task3_frontier.sqlite"
+WORKERS = 8  # concurrent page fetches in parallel mode
+PAGE_PATTERN = re.compile(r"^(.*page-)(\d+)(\.html)$")
 
-def scrape_books():
-    a = 1
-    page_url = BASE_URL
+def parse_page(html, page_url, parser=None):
+    parser = parser or get_backend()
+    doc = parser.parse(html, LISTING)
+    titles = [parser.text(book).strip() for book in parser.select(doc, TITLE_LINK)]
+    next_page = parser.select_one(doc, NEXT_LINK)
+    next_url = urljoin(page_url, parser.attr(next_page, "href")) if next_page is not None else None
+    return titles, next_url
 
-    while page_url:
-        print(f'Page : {a}')
-        response = requests.get(page_url)
-        soup = BeautifulSoup(response.text, "html.parser")
+def parse_pager(html, parser=None):
+    """Return (current, total) from the "Page 1 of 50" pager, or None if there is none."""
+    parser = parser or get_backend()
+    pager = parser.select_one(parser.parse(html, PAGER), PAGER_CURRENT)
+    if pager is None:
+        return None
+    words = parser.text(pager).split()
+    try:
+        return int(words[1]), int(words[-1])
+    except (IndexError, ValueError):
+        return None
+
+def speculative_urls(html, next_url):
+    """Guess the URLs of all remaining pages from the pager and the page-N.html next link."""
+    pager = parse_pager(html)
+    match = PAGE_PATTERN.match(next_url or "")
+    if pager is None or match is None or int(match.group(2)) != pager[0] + 1:
+        return []
+    prefix, suffix = match.group(1), match.group(3)
+    return [f"{prefix}{n}{suffix}" for n in range(pager[0] + 1, pager[1] + 1)]
+
+def fetch_page(url):
+    """(url, status, html) of a page; a failed fetch gives status None like any other miss."""
+    try:
+        response = http_cache.get(url)
+    except requests.RequestException:
+        return url, None, None
+    return url, response.status_code, response.text
 
-        titles = [book.get_text(strip=True) for book in soup.select("h3 a")]
+def print_page(a, page_url, titles):
+    print(f'Page : {a}')
+    print(f"\nScraping: {page_url}")
+    print("Book Titles:")
+    for title in titles:
+        print(f"- {title}")
 
-        print(f"\nScraping: {page_url}")
-        print("Book Titles:")
-        for title in titles:
-            print(f"- {title}")
+def scrape_books(frontier_file=FRONTIER_FILE, parallel=False):
+    frontier = CrawlFrontier(frontier_file)
+    frontier.add([BASE_URL])
+    a = frontier.count() + 1
+    if a > 1:
+        print(f"Resuming after {a - 1} finished pages")
+    retried = frontier.requeue_failed()
+    if retried:
+        print(f"Retrying {retried} pages that failed last time")
+    processed = 0
+    checkpoint_time = 0.0
+    speculated = not parallel
+    page_url = frontier.next_pending()
+    if page_url is None:
+        print(f"Crawl already complete, delete {frontier_file} to start over.")
+
+    while page_url:
+        # Only a 200 completes a page; an error page or a dropped connection is set
+        # aside so the next run fetches it again instead of taking it as the last page.
+        url, status, html = fetch_page(page_url)
+        if status != 200:
+            print(f"\nFailed: {page_url} ({status or 'no response'})")
+            frontier.fail(page_url)
+            page_url = frontier.next_pending()
+            continue
+        titles, next_url = parse_page(html, page_url)
+        print_page(a, page_url, titles)
 
-        next_page = soup.select_one("li.next a")
-        page_url = urljoin(page_url, next_page["href"]) if next_page else None
+        start = time.perf_counter()
+        frontier.complete(page_url, titles, [next_url] if next_url else [])
+        checkpoint_time += time.perf_counter() - start
+        processed += 1
         a += 1
 
+        if not speculated:
+            speculated = True
+            urls = speculative_urls(html, next_url)
+            with ThreadPoolExecutor(WORKERS) as executor:
+                # Pages are consumed in order and each must be the one the previous
+                # page links to; on the first mismatch or failed fetch the rest is cancelled
+                # and the crawl falls back to following next links from the last good page.
+                expected = next_url
+                for url, status, html in executor.map(fetch_page, urls):
+                    if url != expected or status != 200:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+                    titles, expected = parse_page(html, url)
+                    print_page(a, url, titles)
+
+                    start = time.perf_counter()
+                    frontier.complete(url, titles, [expected] if expected else [])
+                    checkpoint_time += time.perf_counter() - start
+                    processed += 1
+                    a += 1
+
+        page_url = frontier.next_pending()
+
+    failed = frontier.count(FAILED)
+    if failed:
+        print(f"\n{failed} pages failed, run again to retry them and crawl on from there.")
+    if processed:
+        print(f"\nCheckpoint overhead: {checkpoint_time * 1000 / processed:.2f} ms/page")
+        print(f"Connections: {connection_stats()}")
+        print(f"HTTP cache: {http_cache.default_cache().stats()}")
+    results = frontier.results()
+    frontier.close()
+    return results
+
 if __name__ == "__main__":
-    scrape_books()
+    scrape_books(parallel="--parallel" in sys.argv)
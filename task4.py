@@ -1,20 +1,28 @@
-import requests
+import http_cache
+from sessions import shared_session
 
 base_url = "http://books.toscrape.com/"
+session = shared_session()
 
 print("Performing GET request...")
-response_get = requests.get(base_url)
+response_get = session.get(base_url)
 print(f"GET Status Code: {response_get.status_code}")
 print(f"GET Response Headers: {response_get.headers}\n")
 
 print("Performing HEAD request...")
-response_head = requests.head(base_url)
+response_head = session.head(base_url)
 print(f"HEAD Status Code: {response_head.status_code}")
 print(f"HEAD Response Headers: {response_head.headers}\n")
 
+# HEAD describes the same version as GET without the body, which is what
+# http_cache probes with before re-downloading a cached page.
+print("Comparing HEAD with GET...")
+print(f"Same version: {not http_cache.changed(response_get.headers, response_head.headers)}")
+print(f"Body bytes saved by HEAD: {len(response_get.content)}\n")
+
 print("Performing POST request...")
 post_data = {"example_key": "example_value"}
-response_post = requests.post(base_url, data=post_data)
+response_post = session.post(base_url, data=post_data)
 print(f"POST Status Code: {response_post.status_code}")
 print(f"POST Response Headers: {response_post.headers}")
 print(f"POST Response Body: {response_post.text[:500]}...\n")
@@ -1,29 +1,45 @@
-import ssl
-import socket
-import requests
+import argparse
+import time
+import cert_audit
 
 url = "https://books.toscrape.com/"
 
-try:
-    response = requests.get(url, verify=True)
-    print("SSL Verification: SUCCESS")
-except requests.exceptions.SSLError:
-    print("SSL Verification: FAILED")
 
-try:
-    response = requests.get(url, verify=False)
-    print("SSL Verification Disabled: Request Successful")
-except requests.exceptions.SSLError:
-    print("SSL Verification Disabled: Request Failed")
+def format_time(seconds):
+    return time.strftime('%b %d %H:%M:%S %Y GMT', time.gmtime(seconds))
 
-hostname = "books.toscrape.com"
-context = ssl.create_default_context()
 
-with socket.create_connection((hostname, 443)) as sock:
-    with context.wrap_socket(sock, server_hostname=hostname) as ssock:
-        cert = ssock.getpeercert()
-        print("SSL Certificate Information:")
-        print(f"Subject: {cert['subject']}")
-        print(f"Issuer: {cert['issuer']}")
-        print(f"Valid From: {cert['notBefore']}")
-        print(f"Valid Until: {cert['notAfter']}")
\ No newline at end of file
+def check_certificate(target):
+    """Verify and describe one host's certificate in a single handshake
+    (plus an unverified one only when verification fails)."""
+    result = cert_audit.audit_all([target])[0]
+    if result['verified']:
+        print("SSL Verification: SUCCESS")
+    else:
+        print(f"SSL Verification: FAILED ({result['error']})")
+    if 'not_after' not in result:
+        if result.get('unparsed'):
+            print("Certificate details unavailable: install cryptography to decode an unverified certificate")
+        return result
+    print("SSL Certificate Information:")
+    print(f"Subject: {result['subject']}")
+    print(f"Issuer: {result['issuer']}")
+    print(f"Valid From: {format_time(result['not_before'])}")
+    print(f"Valid Until: {format_time(result['not_after'])}")
+    print(f"Subject Alt Names: {', '.join(result['san'])}")
+    print(f"Days Left: {result['days_left']}{' (expiring soon)' if result['expiring'] else ''}")
+    return result
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Check one host's certificate, or audit many concurrently.")
+    arg_parser.add_argument('hosts', nargs='*', help=f"host, host:port or URL (default {url})")
+    arg_parser.add_argument('--file', help="file with one host per line")
+    args = arg_parser.parse_args()
+    targets = args.hosts + (cert_audit.read_targets(args.file) if args.file else [])
+    if len(targets) > 1:
+        cache = cert_audit.CertCache()
+        cert_audit.print_report(cert_audit.audit_all(targets, cache=cache))
+        cache.close()
+    else:
+        check_certificate(targets[0] if targets else url)
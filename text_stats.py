@@ -0,0 +1,138 @@
+import argparse
+import codecs
+import locale
+import mmap
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+CHUNK_BYTES = 16 * 1024 * 1024  # bytes counted per task; each worker decodes one chunk at a time
+COPY_BUFFER = 1024 * 1024
+# Chunk cut points; never '\r', so a '\r\n' pair is not split across chunks.
+CUT_POINT = re.compile(rb'[ \t\n\x0b\x0c]')
+# Whitespace to str.split() that bytes.split() does not know about, as UTF-8:
+# \x1c-\x1f, U+0085, U+00A0, U+1680, U+205F, U+3000, and U+2000-U+200A, U+2028,
+# U+2029, U+202F, which share their first two bytes with common punctuation.
+UNICODE_ONLY_SPACES = (b'\x1c', b'\x1d', b'\x1e', b'\x1f', b'\xc2\x85', b'\xc2\xa0',
+                       b'\xe1\x9a\x80', b'\xe2\x81\x9f', b'\xe3\x80\x80')
+PUNCTUATION_BLOCK_SPACE = re.compile(rb'\xe2\x80[\x80-\x8a\xa8\xa9\xaf]')
+SPACE_BYTES = np.zeros(256, dtype=bool)
+SPACE_BYTES[list(b' \t\n\r\x0b\x0c')] = True
+
+
+def chunk_bounds(mm, size, chunk_bytes=CHUNK_BYTES):
+    """(start, end) byte ranges of roughly chunk_bytes each, every cut placed just after whitespace.
+
+    Cutting after an ASCII whitespace byte keeps words and multi-byte UTF-8
+    characters whole, since continuation bytes never look like ASCII.
+    """
+    bounds = []
+    start = 0
+    while start < size:
+        end = min(size, start + chunk_bytes)
+        if end < size:
+            match = CUT_POINT.search(mm, end)
+            end = match.end() if match else size
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def count_text(text):
+    """(newlines, words, non-whitespace characters, ends with a newline) for one decoded chunk.
+
+    Newlines are counted the way text-mode files iterate lines: '\\n', '\\r\\n' and a lone '\\r'.
+    """
+    newlines = text.count('\n') + text.count('\r') - text.count('\r\n')
+    words = text.split()
+    return newlines, len(words), sum(map(len, words)), text[-1:] in ('\n', '\r')
+
+
+def count_utf8(chunk):
+    """count_text for UTF-8 bytes whose only whitespace is ASCII, without building any strings."""
+    newlines = chunk.count(b'\n') + chunk.count(b'\r') - chunk.count(b'\r\n')
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    space = SPACE_BYTES[data]
+    word_start = ~space
+    word_start[1:] &= space[:-1]
+    # Every character has exactly one byte that is not a continuation byte (10xxxxxx).
+    characters = np.count_nonzero(~space & ((data & 0xC0) != 0x80))
+    return newlines, int(np.count_nonzero(word_start)), int(characters), chunk[-1:] in (b'\n', b'\r')
+
+
+def has_unicode_only_space(chunk):
+    # Plain substring searches are far quicker than one regex with alternatives.
+    if any(space in chunk for space in UNICODE_ONLY_SPACES):
+        return True
+    return b'\xe2\x80' in chunk and PUNCTUATION_BLOCK_SPACE.search(chunk) is not None
+
+
+def count_range(path, start, end, encoding):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunk = mm[start:end]
+    text = chunk.decode(encoding)  # also raises on bad input, as reading the file in text mode would
+    if codecs.lookup(encoding).name in ('utf-8', 'ascii') and not has_unicode_only_space(chunk):
+        return count_utf8(chunk)
+    return count_text(text)
+
+
+def file_stats(path='data.txt', workers=None, encoding=None, chunk_bytes=CHUNK_BYTES):
+    """Line, word and character counts for `path` in a single memory-mapped pass.
+
+    Matches what week1.read_file_data computes by iterating the file in text
+    mode. Chunks are counted in parallel when there is more than one; the
+    encoding must be ASCII-compatible (UTF-8, Latin-1, ...).
+    """
+    encoding = encoding or locale.getpreferredencoding(False)
+    size = os.path.getsize(path)
+    if size == 0:
+        counts = []
+    else:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bounds = chunk_bounds(mm, size, chunk_bytes)
+        if len(bounds) == 1:
+            counts = [count_range(path, *bounds[0], encoding)]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                counts = list(pool.map(count_range, *zip(*[(path, s, e, encoding) for s, e in bounds])))
+    lines = sum(c[0] for c in counts)
+    if counts and not counts[-1][3]:
+        lines += 1  # last line has no terminating newline
+    return {
+        "Lines": lines,
+        "Words": sum(c[1] for c in counts),
+        "Characters (excluding spaces/newlines)": sum(c[2] for c in counts),
+    }
+
+
+def write_report(stats, output='output.txt', source='data.txt', copy_content=True, encoding=None):
+    """Write the same report as week1.read_file_data, streaming the file content instead of holding it."""
+    with open(output, 'w') as output_file:
+        output_file.write("Extracted Data:\n")
+        output_file.write(f"Lines: {stats['Lines']}\n")
+        output_file.write(f"Words: {stats['Words']}\n")
+        output_file.write(f"Characters : {stats['Characters (excluding spaces/newlines)']}\n\n")
+        output_file.write("File Content:\n")
+        if copy_content:
+            # Text mode on both ends gives the same newline handling as read() then write().
+            with open(source, 'r', encoding=encoding) as file:
+                shutil.copyfileobj(file, output_file, COPY_BUFFER)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Count lines, words and characters of a large text file.")
+    arg_parser.add_argument('path', nargs='?', default='data.txt')
+    arg_parser.add_argument('--workers', type=int, default=None)
+    arg_parser.add_argument('--output', default='output.txt')
+    arg_parser.add_argument('--no-copy', action='store_true', help="leave the file content out of the report")
+    args = arg_parser.parse_args()
+    stats = file_stats(args.path, args.workers)
+    write_report(stats, args.output, args.path, copy_content=not args.no_copy)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
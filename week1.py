@@ -2,14 +2,29 @@
 import numpy as np
 import random
 from collections import Counter
+from text_stats import file_stats, write_report
 
-def read_file_data():
+def read_file_data(streaming=False, copy_content=True, workers=None):
+    """Count lines, words and characters of data.txt and write the report to output.txt.
+
+    streaming=True counts in one memory-mapped pass (in parallel for large
+    files) and streams the content into output.txt, or leaves it out when
+    copy_content is False, instead of holding the whole file in memory.
+    """
     linecounter = 0
     wordcounter = 0
     charactercounter = 0
     file_content = ""
 
     try:
+        if streaming:
+            extracted_data = file_stats('data.txt', workers)
+            write_report(extracted_data, 'output.txt', 'data.txt', copy_content)
+            print(f"Lines: {extracted_data['Lines']}")
+            print(f"Words: {extracted_data['Words']}")
+            print(f"Characters : {extracted_data['Characters (excluding spaces/newlines)']}")
+            return extracted_data
+
         with open('data.txt', 'r') as file:
             file_content = file.read()
             file.seek(0)
@@ -0,0 +1,55 @@
+import json
+from items import plain
+
+
+class JsonArrayWriter:
+    """Writes records one at a time into a JSON array laid out like json.dump(..., indent=2)."""
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write(self, record):
+        text = json.dumps(record, ensure_ascii=False, indent=2, default=plain)
+        text = '\n'.join('  ' + line for line in text.split('\n'))
+        self.file.write(('[\n' if self.count == 0 else ',\n') + text)
+        self.count += 1
+
+    def close(self):
+        self.file.write('\n]' if self.count else '[]')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class NdjsonWriter:
+    """Writes one JSON object per line."""
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False, default=plain) + '\n')
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def open_writer(filename):
+    if filename.endswith('.ndjson') or filename.endswith('.jsonl'):
+        return NdjsonWriter(filename)
+    return JsonArrayWriter(filename)